@@ -0,0 +1,244 @@
+"""추출 요청을 처리하는 백엔드 인터페이스와 Gemini 구현
+
+SimplePDFExtractor는 ExtractionBackend 프로토콜만 사용하므로, base_url을
+fake_gemini_server.py로 지정하거나 다른 구현을 넘겨 API 없이 실행할 수 있음.
+"""
+
+import asyncio
+import base64
+import logging
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Protocol
+
+from google import genai
+from google.genai import types
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+
+
+@dataclass
+class ExtractionRequest:
+    """백엔드에 보내는 추출 요청
+
+    prompt는 모든 요청에 공통인 지시문(system instruction)이고, parts는
+    (mime_type, 내용) 목록이며 text/plain 내용은 str, 나머지는 bytes.
+    """
+
+    prompt: str
+    parts: list
+    model: str = DEFAULT_MODEL
+    # 응답 형식을 강제할 JSON schema (output_schema.response_schema)
+    response_schema: dict = None
+
+
+@dataclass
+class ExtractionResponse:
+    """백엔드 응답 텍스트와 토큰 사용량
+
+    prompt_tokens는 캐시된 토큰(cached_tokens)을 포함한 전체 입력 토큰 수.
+    """
+
+    text: str
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    cached_tokens: int = 0
+    model: str = ""
+
+
+class ExtractionBackend(Protocol):
+    """추출 백엔드가 구현해야 하는 메서드"""
+
+    async def generate(self, request: ExtractionRequest) -> ExtractionResponse:
+        """요청을 처리하고 JSON 텍스트가 담긴 응답을 반환"""
+        ...
+
+    def stream(self, request: ExtractionRequest) -> AsyncIterator[ExtractionResponse]:
+        """응답을 조각 단위(새로 받은 text)로 내보내는 비동기 반복자를 반환
+
+        스트리밍 모드에서만 사용함. 토큰 사용량은 마지막 조각에 담김.
+        """
+        ...
+
+    async def aclose(self) -> None:
+        """백엔드가 사용하는 자원을 정리"""
+        ...
+
+
+def to_gemini_parts(parts):
+    """(mime_type, 내용) 목록을 google.genai Part 목록으로 변환"""
+    result = []
+    for mime_type, payload in parts:
+        if mime_type == "text/plain":
+            result.append(types.Part.from_text(text=payload))
+        else:
+            result.append(types.Part.from_bytes(data=payload, mime_type=mime_type))
+    return result
+
+
+def to_rest_request(request):
+    """요청을 generateContent REST 본문(dict)으로 변환 (Batch API 입력 파일용)"""
+    parts = []
+    for mime_type, payload in request.parts:
+        if mime_type == "text/plain":
+            parts.append({"text": payload})
+        else:
+            data = base64.b64encode(payload).decode("ascii")
+            parts.append({"inlineData": {"mimeType": mime_type, "data": data}})
+    generation_config = {"responseMimeType": "application/json"}
+    if request.response_schema:
+        generation_config["responseSchema"] = request.response_schema
+    return {
+        "systemInstruction": {"parts": [{"text": request.prompt}]},
+        "contents": [{"role": "user", "parts": parts}],
+        "generationConfig": generation_config,
+    }
+
+
+def rest_response_text(response):
+    """generateContent REST 응답(dict)에서 첫 번째 후보의 텍스트를 꺼냄"""
+    candidates = response.get("candidates") or [{}]
+    parts = candidates[0].get("content", {}).get("parts", [])
+    return "".join(part.get("text", "") for part in parts)
+
+
+class GeminiBackend:
+    """google-genai 클라이언트로 generate_content를 호출하는 백엔드
+
+    base_url을 지정하면 해당 주소(예: 로컬 fake_gemini_server)로 요청을 보냄.
+    프롬프트는 system_instruction으로 보내고, cache_prompt를 켜면 모델별로
+    cached content를 한 번 만들어 모든 요청에서 참조함 (TTL은 자동 연장).
+    """
+
+    def __init__(self, api_key, base_url=None, cache_prompt=False, cache_ttl=3600):
+        http_options = types.HttpOptions(base_url=base_url) if base_url else None
+        self.client = genai.Client(api_key=api_key, http_options=http_options)
+        self.cache_prompt = cache_prompt
+        self.cache_ttl = cache_ttl
+        # (모델, 프롬프트) -> (cached content 이름, 만료 시각) 또는 None(생성 불가)
+        self._caches = {}
+        self._cache_lock = asyncio.Lock()
+
+    async def _create_cache(self, model, prompt):
+        cache = await self.client.aio.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                system_instruction=prompt,
+                ttl=f"{self.cache_ttl}s",
+                display_name="simple-pdf-parser-prompt",
+            ),
+        )
+        logger.info(f"프롬프트 캐시 생성: {cache.name} ({model})")
+        return cache.name
+
+    async def _refresh_cache(self, name):
+        await self.client.aio.caches.update(
+            name=name,
+            config=types.UpdateCachedContentConfig(ttl=f"{self.cache_ttl}s"),
+        )
+        logger.info(f"프롬프트 캐시 TTL 연장: {name}")
+
+    async def _cached_content(self, model, prompt):
+        """모델/프롬프트에 해당하는 cached content 이름 (사용할 수 없으면 None)"""
+        key = (model, prompt)
+        async with self._cache_lock:
+            if key in self._caches and self._caches[key] is None:
+                return None
+
+            now = time.monotonic()
+            try:
+                if key not in self._caches:
+                    name = await self._create_cache(model, prompt)
+                    self._caches[key] = (name, now + self.cache_ttl)
+                else:
+                    name, expires_at = self._caches[key]
+                    # 남은 TTL이 1/4 아래로 내려가면 연장
+                    if expires_at - now < self.cache_ttl / 4:
+                        await self._refresh_cache(name)
+                        self._caches[key] = (name, now + self.cache_ttl)
+            except Exception as e:
+                code = getattr(e, "code", None)
+                if not (isinstance(code, int) and 400 <= code < 500):
+                    raise
+                # 최소 토큰 수 미달 등으로 캐시를 쓸 수 없으면 system_instruction으로 전송
+                logger.warning(f"프롬프트 캐시를 사용하지 않습니다 ({model}): {e}")
+                self._caches[key] = None
+                return None
+            return self._caches[key][0]
+
+    async def _prepare(self, request):
+        """요청의 contents와 config, 사용한 캐시 이름을 만듦"""
+        contents = [types.Content(role="user", parts=to_gemini_parts(request.parts))]
+        cache_name = None
+        if self.cache_prompt:
+            cache_name = await self._cached_content(request.model, request.prompt)
+        if cache_name:
+            config = types.GenerateContentConfig(
+                cached_content=cache_name,
+                response_mime_type="application/json",
+                response_schema=request.response_schema,
+            )
+        else:
+            config = types.GenerateContentConfig(
+                system_instruction=request.prompt,
+                response_mime_type="application/json",
+                response_schema=request.response_schema,
+            )
+        return contents, config, cache_name
+
+    def _on_error(self, request, cache_name, error):
+        if cache_name and getattr(error, "code", None) in (403, 404):
+            # 캐시가 만료/삭제되었으면 다음 시도에서 새로 만듦
+            self._caches.pop((request.model, request.prompt), None)
+
+    def _to_response(self, request, response, text):
+        usage = response.usage_metadata
+        return ExtractionResponse(
+            text=text,
+            prompt_tokens=(usage and usage.prompt_token_count) or 0,
+            output_tokens=(usage and usage.candidates_token_count) or 0,
+            cached_tokens=(usage and usage.cached_content_token_count) or 0,
+            model=response.model_version or request.model,
+        )
+
+    async def generate(self, request):
+        contents, config, cache_name = await self._prepare(request)
+        try:
+            response = await self.client.aio.models.generate_content(
+                model=request.model, contents=contents, config=config
+            )
+        except Exception as e:
+            self._on_error(request, cache_name, e)
+            raise
+        return self._to_response(request, response, response.text or "")
+
+    async def stream(self, request):
+        """응답을 조각 단위로 받아 ExtractionResponse로 하나씩 내보냄
+
+        각 조각의 text는 새로 받은 부분이고, 토큰 사용량은 마지막 조각에 담김.
+        """
+        contents, config, cache_name = await self._prepare(request)
+        try:
+            async for response in await self.client.aio.models.generate_content_stream(
+                model=request.model, contents=contents, config=config
+            ):
+                yield self._to_response(request, response, response.text or "")
+        except Exception as e:
+            self._on_error(request, cache_name, e)
+            raise
+
+    async def aclose(self):
+        for entry in self._caches.values():
+            if entry is None:
+                continue
+            try:
+                await self.client.aio.caches.delete(name=entry[0])
+            except Exception as e:
+                logger.warning(f"프롬프트 캐시 삭제 실패: {entry[0]} ({e})")
+        self._caches.clear()
+
+        aclose = getattr(self.client.aio, "aclose", None)
+        if aclose is not None:
+            await aclose()
@@ -0,0 +1,382 @@
+"""Gemini Batch API로 대량의 PDF를 처리하는 배치 모드
+
+대화형 지연 시간이 필요 없는 야간 재처리용. 모든 청크 요청을 Batch API 입력
+파일(JSONL)로 만들어 제출하고, 완료될 때까지 상태를 확인한 뒤 결과를 문서와
+페이지 인덱스에 맞춰 되돌려 _merge_results/_json_to_text로 출력함.
+
+제출한 작업 이름은 상태 파일에 저장하므로 중단된 실행을 다시 시작하면
+다시 제출하지 않고 상태 확인부터 이어서 진행함.
+
+사용 예:
+    uv run batch_runner.py pdfs/ --output_dir output --poll_interval 300
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from glob import glob
+
+import fitz
+from dotenv import load_dotenv
+from google import genai
+from google.genai import types
+
+from backends import DEFAULT_MODEL, rest_response_text, to_rest_request
+from output_schema import OUTPUT_SCHEMAS, expand_result
+from pdf_payload import PAYLOAD_POLICIES, PDFChunk
+from simple_pdf_parser import SimplePDFExtractor
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+STATE_FILENAME = "batch_state.json"
+# 작업 하나의 입력 파일 최대 크기 (Batch API 입력 파일 한도 2GB보다 작게)
+MAX_JOB_BYTES = 500 * 1024 * 1024
+DEFAULT_POLL_INTERVAL = 60
+SUCCEEDED = "JOB_STATE_SUCCEEDED"
+TERMINAL_STATES = {
+    SUCCEEDED,
+    "JOB_STATE_FAILED",
+    "JOB_STATE_CANCELLED",
+    "JOB_STATE_EXPIRED",
+}
+
+
+class BatchState:
+    """배치 실행 상태(문서/청크 정보, 작업 이름과 진행 상태)를 저장하는 파일"""
+
+    def __init__(self, path):
+        self.path = path
+        self.data = {"prepared": False, "documents": {}, "jobs": []}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.data = json.load(f)
+
+    @property
+    def documents(self):
+        return self.data["documents"]
+
+    @property
+    def jobs(self):
+        return self.data["jobs"]
+
+    def save(self):
+        """임시 파일에 쓴 뒤 교체하여 중단되어도 상태 파일이 깨지지 않게 함"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+def _job_state(job):
+    state = job.state
+    return getattr(state, "name", str(state))
+
+
+def _chunk_from_info(info):
+    """상태 파일의 청크 정보로 페이지 범위만 담은 PDFChunk를 복원"""
+    return PDFChunk(
+        data=b"",
+        start_page=info["start_page"],
+        end_page=info["end_page"],
+        context_before=info["context_before"],
+        context_after=info["context_after"],
+    )
+
+
+class BatchRunner:
+    """청크 요청 직렬화, 작업 제출/상태 확인, 결과 출력을 담당"""
+
+    def __init__(
+        self,
+        output_dir,
+        api_key=None,
+        state_path=None,
+        poll_interval=DEFAULT_POLL_INTERVAL,
+        model=DEFAULT_MODEL,
+        **extractor_options,
+    ):
+        self.output_dir = output_dir
+        self.poll_interval = poll_interval
+        self.model = model
+        # 청크 생성, 결과 재조정/병합/출력은 대화형 모드와 같은 코드를 사용
+        self.extractor = SimplePDFExtractor(
+            output_dir=output_dir, api_key=api_key, model=model, **extractor_options
+        )
+        self.client = genai.Client(api_key=self.extractor.api_key)
+        self.state = BatchState(state_path or os.path.join(output_dir, STATE_FILENAME))
+
+    def close(self):
+        self.extractor.close()
+
+    def _input_path(self, index):
+        return os.path.join(self.output_dir, f"batch_input_{index}.jsonl")
+
+    def prepare(self, pdf_files):
+        """모든 문서의 청크 요청을 작업별 입력 파일로 직렬화"""
+        extractor = self.extractor
+        documents = {}
+        jobs = []
+        out = None
+        job_bytes = 0
+
+        def open_job():
+            path = self._input_path(len(jobs))
+            jobs.append({"input_path": path, "keys": [], "name": None})
+            return open(path, "w", encoding="utf-8")
+
+        try:
+            for doc_index, pdf_path in enumerate(sorted(pdf_files)):
+                doc_id = f"d{doc_index}"
+                base_filename = os.path.splitext(os.path.basename(pdf_path))[0]
+                chunks = {}
+                with fitz.open(pdf_path) as doc:
+                    route = extractor._route_pages(doc)
+                    for chunk in extractor._iter_chunks(doc, None, route):
+                        extractor._record_chunk(chunk)
+                        key = f"{doc_id}-{chunk.start_page}-{chunk.end_page}"
+                        request = extractor._extraction_request(
+                            extractor._chunk_payload_parts(chunk)
+                        )
+                        line = json.dumps(
+                            {"key": key, "request": to_rest_request(request)},
+                            ensure_ascii=False,
+                        )
+                        if out is None or job_bytes + len(line) > MAX_JOB_BYTES:
+                            if out is not None:
+                                out.close()
+                            out = open_job()
+                            job_bytes = 0
+                        out.write(line + "\n")
+                        job_bytes += len(line) + 1
+                        jobs[-1]["keys"].append(key)
+                        chunks[key] = {
+                            "start_page": chunk.start_page,
+                            "end_page": chunk.end_page,
+                            "context_before": chunk.context_before,
+                            "context_after": chunk.context_after,
+                        }
+
+                documents[doc_id] = {
+                    "pdf_path": pdf_path,
+                    "output_path": os.path.join(
+                        self.output_dir, f"{base_filename}.txt"
+                    ),
+                    "local_result": route.local_result,
+                    "chunks": chunks,
+                }
+                logger.info(f"배치 요청 생성: {pdf_path} ({len(chunks)}개 청크)")
+        finally:
+            if out is not None:
+                out.close()
+
+        self.state.data = {"prepared": True, "documents": documents, "jobs": jobs}
+        self.state.save()
+
+    def submit(self):
+        """아직 제출하지 않은 작업을 제출하고 작업 이름을 바로 저장"""
+        for index, job in enumerate(self.state.jobs):
+            if job["name"] or not job["keys"]:
+                continue
+            uploaded = self.client.files.upload(
+                file=job["input_path"],
+                config=types.UploadFileConfig(
+                    mime_type="jsonl",
+                    display_name=os.path.basename(job["input_path"]),
+                ),
+            )
+            batch_job = self.client.batches.create(
+                model=self.model,
+                src=uploaded.name,
+                config=types.CreateBatchJobConfig(
+                    display_name=f"simple-pdf-parser-{index}"
+                ),
+            )
+            job["name"] = batch_job.name
+            job["state"] = _job_state(batch_job)
+            self.state.save()
+            logger.info(f"배치 작업 제출: {batch_job.name} ({len(job['keys'])}개 요청)")
+
+    def poll(self):
+        """모든 작업이 끝날 때까지 상태를 확인하고 성공한 작업의 결과를 받음"""
+        while True:
+            pending = 0
+            for job in self.state.jobs:
+                if not job["name"] or job.get("state") in TERMINAL_STATES:
+                    continue
+                batch_job = self.client.batches.get(name=job["name"])
+                job["state"] = _job_state(batch_job)
+                if job["state"] == SUCCEEDED:
+                    job["results_path"] = self._download(job, batch_job)
+                elif job["state"] in TERMINAL_STATES:
+                    logger.error(f"배치 작업 실패: {job['name']} ({job['state']})")
+                else:
+                    pending += 1
+            self.state.save()
+
+            if not pending:
+                return
+            logger.info(
+                f"배치 작업 {pending}개 진행 중, {self.poll_interval}초 후 다시 확인합니다."
+            )
+            time.sleep(self.poll_interval)
+
+    def _download(self, job, batch_job):
+        results_path = job["input_path"].replace("batch_input_", "batch_output_")
+        data = self.client.files.download(file=batch_job.dest.file_name)
+        with open(results_path, "wb") as f:
+            f.write(data)
+        logger.info(f"배치 결과 수신: {job['name']} -> {results_path}")
+        return results_path
+
+    def _load_results(self):
+        """결과 파일의 응답 JSON을 요청 key별로 모음"""
+        results = {}
+        for job in self.state.jobs:
+            results_path = job.get("results_path")
+            if not results_path:
+                continue
+            with open(results_path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    key = record.get("key")
+                    if "response" not in record:
+                        error = record.get("error") or record.get("status")
+                        logger.error(f"배치 요청 실패: {key} ({error})")
+                        continue
+                    text = rest_response_text(record["response"])
+                    try:
+                        results[key] = expand_result(json.loads(text))
+                    except json.JSONDecodeError as e:
+                        logger.error(f"JSON 파싱 실패: {key} ({e})")
+        return results
+
+    def render(self):
+        """결과를 문서별로 병합하여 텍스트 파일로 저장"""
+        extractor = self.extractor
+        results = self._load_results()
+        for document in self.state.documents.values():
+            chunk_results = []
+            api_pages = set()
+            for key, info in document["chunks"].items():
+                chunk = _chunk_from_info(info)
+                api_pages.update(range(chunk.core_start, chunk.core_end))
+                result_json = results.get(key)
+                if result_json is None:
+                    chunk_results.append(
+                        extractor._failed_result(chunk, "batch_failed")
+                    )
+                    continue
+                result_json = extractor._rebase_result(chunk, result_json)
+                result_json["pages"] = [chunk.core_start, chunk.core_end]
+                chunk_results.append(result_json)
+
+            final_json = extractor._merge_results(
+                [document["local_result"], *chunk_results]
+            )
+            final_text = extractor._json_to_text(final_json)
+            extractor._write_text(document["output_path"], final_text)
+            extractor._write_missing(
+                document["output_path"],
+                document["pdf_path"],
+                extractor._missing_ranges(sorted(api_pages), chunk_results),
+            )
+            logger.info(f"텍스트 추출 완료: {document['output_path']}")
+
+    def run(self, input_path):
+        """준비(또는 이어하기) -> 제출 -> 상태 확인 -> 출력"""
+        if self.state.data["prepared"]:
+            logger.info(f"저장된 배치 상태에서 이어서 진행합니다: {self.state.path}")
+        else:
+            if os.path.isdir(input_path):
+                pdf_files = glob(os.path.join(input_path, "*.pdf"))
+            else:
+                pdf_files = [input_path]
+            if not pdf_files:
+                logger.warning("처리할 PDF 파일을 찾지 못했습니다.")
+                return
+            self.prepare(pdf_files)
+
+        self.submit()
+        self.poll()
+        self.render()
+        self.extractor.stats.log_summary()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format="[%(asctime)s] %(levelname)s - %(message)s"
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Gemini Batch API로 PDF에서 텍스트를 추출합니다."
+    )
+    parser.add_argument(
+        "input_path", help="입력 PDF 파일 경로 또는 PDF 파일이 포함된 디렉터리 경로"
+    )
+    parser.add_argument("--output_dir", default="output", help="출력 디렉터리 경로")
+    parser.add_argument(
+        "--api_key", help="Gemini API 키 (환경변수 GEMINI_API_KEY로도 설정 가능)"
+    )
+    parser.add_argument(
+        "--state",
+        help=f"배치 상태 파일 경로 (기본값: 출력 디렉터리의 {STATE_FILENAME})",
+    )
+    parser.add_argument(
+        "--poll_interval",
+        type=float,
+        default=DEFAULT_POLL_INTERVAL,
+        help="작업 상태 확인 간격(초)",
+    )
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="사용할 모델 이름")
+    parser.add_argument("--chunk_size", type=int, default=3, help="청크당 페이지 수")
+    parser.add_argument(
+        "--adaptive_chunking",
+        action="store_true",
+        help="페이지 비용 추정치로 청크 크기를 자동 조절",
+    )
+    parser.add_argument(
+        "--hybrid",
+        action="store_true",
+        help="텍스트 레이어가 온전한 페이지는 로컬에서 추출",
+    )
+    parser.add_argument(
+        "--payload_policy",
+        default="pdf",
+        choices=PAYLOAD_POLICIES,
+        help="청크 전송 형식 정책",
+    )
+    parser.add_argument(
+        "--chunk_overlap", type=int, default=0, help="청크 앞뒤 문맥 확인용 페이지 수"
+    )
+    parser.add_argument(
+        "--output_schema",
+        default="full",
+        choices=OUTPUT_SCHEMAS,
+        help="응답 형식 강제 방식 (compact는 짧은 키로 출력 토큰 절감)",
+    )
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    runner = BatchRunner(
+        output_dir=args.output_dir,
+        api_key=args.api_key,
+        state_path=args.state,
+        poll_interval=args.poll_interval,
+        model=args.model,
+        chunk_size=args.chunk_size,
+        adaptive_chunking=args.adaptive_chunking,
+        hybrid=args.hybrid,
+        payload_policy=args.payload_policy,
+        chunk_overlap=args.chunk_overlap,
+        output_schema=args.output_schema,
+    )
+    try:
+        runner.run(args.input_path)
+    finally:
+        runner.close()
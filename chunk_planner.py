@@ -0,0 +1,249 @@
+"""페이지별 비용을 추정하여 청크 경계를 정하는 플래너"""
+
+from collections import Counter
+from dataclasses import dataclass
+
+import fitz
+
+# Gemini는 PDF 페이지 하나를 258 토큰으로 계산함
+PDF_PAGE_TOKENS = 258
+# 한글 위주 문서 기준 대략적인 글자/토큰 비율
+CHARS_PER_TOKEN = 2.0
+# JSON 키, 마크다운 표 구문 등으로 늘어나는 출력량 비율
+OUTPUT_OVERHEAD = 1.3
+# 텍스트 레이어가 없는(스캔) 페이지의 출력 토큰 추정치
+SCANNED_PAGE_OUTPUT_TOKENS = 800
+# 페이지 객체, 리소스 사전 등 페이지마다 붙는 고정 크기
+PAGE_OVERHEAD_BYTES = 2048
+
+DEFAULT_TARGET_CHUNK_BYTES = 2 * 1024 * 1024
+DEFAULT_MAX_CHUNK_INPUT_TOKENS = PDF_PAGE_TOKENS * 20
+DEFAULT_MAX_CHUNK_OUTPUT_TOKENS = 6000
+DEFAULT_MAX_CHUNK_PAGES = 20
+
+# 본문 글꼴보다 이 비율 이상 크면 제목으로 간주
+HEADING_SIZE_RATIO = 1.25
+# 페이지 상단에서 제목을 찾을 줄 수와 영역 비율
+HEADING_TOP_LINES = 3
+HEADING_TOP_AREA = 0.4
+# 제목으로 보기에는 너무 긴 줄
+HEADING_MAX_CHARS = 80
+
+
+@dataclass(frozen=True)
+class PageCost:
+    """페이지 하나를 전송/추출할 때의 비용 추정치"""
+
+    page_index: int
+    content_bytes: int
+    image_count: int
+    image_pixels: int
+    image_bytes: int
+    text_chars: int
+
+    @property
+    def est_bytes(self):
+        return self.content_bytes + self.image_bytes + PAGE_OVERHEAD_BYTES
+
+    @property
+    def est_input_tokens(self):
+        return PDF_PAGE_TOKENS
+
+    @property
+    def est_output_tokens(self):
+        if self.text_chars < 20 and self.image_count:
+            return SCANNED_PAGE_OUTPUT_TOKENS
+        return int(self.text_chars / CHARS_PER_TOKEN * OUTPUT_OVERHEAD)
+
+
+def stream_length(doc, xref):
+    """스트림 객체의 (압축된) 길이를 반환. 알 수 없으면 0"""
+    kind, value = doc.xref_get_key(xref, "Length")
+    if kind == "int":
+        return int(value)
+    return 0
+
+
+def estimate_page_cost(page):
+    """PyMuPDF 통계로 페이지 비용을 추정"""
+    doc = page.parent
+
+    content_bytes = sum(stream_length(doc, xref) for xref in page.get_contents())
+
+    image_count = 0
+    image_pixels = 0
+    image_bytes = 0
+    for img in page.get_images(full=True):
+        xref, _smask, width, height, bpc = img[:5]
+        image_count += 1
+        image_pixels += width * height
+        length = stream_length(doc, xref)
+        if not length:
+            # 길이를 알 수 없으면 압축률 10%로 가정
+            length = width * height * max(bpc, 1) // 80
+        image_bytes += length
+
+    text_chars = len(page.get_text("text").strip())
+
+    return PageCost(
+        page_index=page.number,
+        content_bytes=content_bytes,
+        image_count=image_count,
+        image_pixels=image_pixels,
+        image_bytes=image_bytes,
+        text_chars=text_chars,
+    )
+
+
+def estimate_document_costs(doc, page_indices=None):
+    """문서의 페이지별 비용 목록을 반환"""
+    if page_indices is None:
+        page_indices = range(doc.page_count)
+    return [estimate_page_cost(doc[i]) for i in page_indices]
+
+
+def _page_lines(page):
+    """페이지의 텍스트 줄을 (y0, 최대 글꼴 크기, 텍스트) 목록으로 반환"""
+    lines = []
+    text_dict = page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)
+    for block in text_dict["blocks"]:
+        for line in block.get("lines", []):
+            spans = [span for span in line["spans"] if span["text"].strip()]
+            if not spans:
+                continue
+            text = "".join(span["text"] for span in spans).strip()
+            size = max(span["size"] for span in spans)
+            lines.append((line["bbox"][1], size, text))
+    lines.sort(key=lambda x: x[0])
+    return lines
+
+
+def find_section_starts(doc, page_indices=None, use_headings=True):
+    """목차(get_toc)와 큰 글꼴 제목으로 섹션이 시작되는 페이지 집합을 반환"""
+    if page_indices is None:
+        page_indices = range(doc.page_count)
+
+    starts = set()
+    for _level, _title, page_no in doc.get_toc(simple=True):
+        if page_no >= 1:
+            starts.add(page_no - 1)
+
+    if not use_headings:
+        return starts
+
+    # 글자 수 기준으로 가장 많이 쓰인 글꼴 크기를 본문 크기로 봄
+    size_counter = Counter()
+    top_lines = {}
+    for i in page_indices:
+        page = doc[i]
+        lines = _page_lines(page)
+        for _y0, size, text in lines:
+            size_counter[round(size, 1)] += len(text)
+        top_limit = page.rect.y0 + page.rect.height * HEADING_TOP_AREA
+        top_lines[i] = [line for line in lines if line[0] <= top_limit][
+            :HEADING_TOP_LINES
+        ]
+
+    if not size_counter:
+        return starts
+
+    body_size = size_counter.most_common(1)[0][0]
+    for i, lines in top_lines.items():
+        for _y0, size, text in lines:
+            is_heading = size >= body_size * HEADING_SIZE_RATIO
+            if is_heading and len(text) <= HEADING_MAX_CHARS:
+                starts.add(i)
+                break
+
+    return starts
+
+
+def _usage(costs):
+    """페이지 비용 목록의 (바이트, 입력 토큰, 출력 토큰, 페이지 수) 합계"""
+    return (
+        sum(c.est_bytes for c in costs),
+        sum(c.est_input_tokens for c in costs),
+        sum(c.est_output_tokens for c in costs),
+        len(costs),
+    )
+
+
+def _combine(a, b):
+    return tuple(x + y for x, y in zip(a, b))
+
+
+def _within(usage, limits):
+    return all(used <= limit for used, limit in zip(usage, limits))
+
+
+def _split_segments(costs, section_starts):
+    """불연속 지점과 섹션 시작 페이지에서 페이지 비용 목록을 나눔"""
+    segment = []
+    for cost in costs:
+        if segment and (
+            cost.page_index != segment[-1].page_index + 1
+            or cost.page_index in section_starts
+        ):
+            yield segment
+            segment = []
+        segment.append(cost)
+    if segment:
+        yield segment
+
+
+def plan_chunks(
+    costs,
+    target_bytes=DEFAULT_TARGET_CHUNK_BYTES,
+    max_input_tokens=DEFAULT_MAX_CHUNK_INPUT_TOKENS,
+    max_output_tokens=DEFAULT_MAX_CHUNK_OUTPUT_TOKENS,
+    max_pages=DEFAULT_MAX_CHUNK_PAGES,
+    section_starts=None,
+):
+    """연속된 페이지를 예산 안에서 묶어 (start, end) 범위 목록을 반환
+
+    end는 포함하지 않음. section_starts가 주어지면 섹션 단위로 묶고,
+    예산을 넘는 섹션만 페이지 단위로 나눔. 페이지 하나가 예산을 넘더라도
+    단독 청크로 만듦.
+    """
+    limits = (target_bytes, max_input_tokens, max_output_tokens, max_pages)
+    section_starts = section_starts or set()
+
+    ranges = []
+    current = []
+    current_usage = (0, 0, 0, 0)
+
+    def flush():
+        nonlocal current, current_usage
+        if current:
+            ranges.append((current[0].page_index, current[-1].page_index + 1))
+        current = []
+        current_usage = (0, 0, 0, 0)
+
+    for segment in _split_segments(costs, section_starts):
+        if current and current[-1].page_index + 1 != segment[0].page_index:
+            flush()
+
+        segment_usage = _usage(segment)
+        combined = _combine(current_usage, segment_usage)
+        if _within(combined, limits):
+            current.extend(segment)
+            current_usage = combined
+            continue
+
+        flush()
+        if _within(segment_usage, limits):
+            current = list(segment)
+            current_usage = segment_usage
+            continue
+
+        # 섹션 하나가 예산을 넘으면 페이지 단위로 나눔
+        for cost in segment:
+            combined = _combine(current_usage, _usage([cost]))
+            if current and not _within(combined, limits):
+                flush()
+                combined = _usage([cost])
+            current.append(cost)
+            current_usage = combined
+
+    flush()
+    return ranges
@@ -0,0 +1,171 @@
+"""API 장애 시 요청을 즉시 멈추고 단일 요청으로 복구 여부를 확인하는 circuit breaker
+
+closed     정상 상태. 서버/네트워크 오류가 연속 failure_threshold번 나면 open
+open       reset_timeout 동안 요청을 보내지 않고 CircuitOpenError로 즉시 실패
+half_open  요청 하나만 시험 삼아 보내고, 성공하면 closed, 실패하면 다시 open
+           (다시 열릴 때마다 reset_timeout은 max_reset_timeout까지 두 배로 늘어남)
+
+시험 요청이 연속 max_failed_probes번 실패하면 복구를 포기한 것으로 보고(gave_up),
+기다리던 호출자를 깨워 요청을 포기하게 함. 이후 시험 요청이 성공하면 다시 closed.
+"""
+
+import asyncio
+import logging
+import time
+
+from retry_policy import SERVER, TIMEOUT, TRANSIENT
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# 장애로 보는 실패 종류 (429는 동시 처리/속도 제한기가 처리)
+OUTAGE_FAILURES = (SERVER, TRANSIENT)
+# 서버 상태를 알려주지 않는 실패 종류 (클라이언트 쪽 제한 시간 초과)
+UNKNOWN_FAILURES = (TIMEOUT,)
+
+
+class CircuitOpenError(Exception):
+    """circuit이 열려 있어 요청을 보내지 않았음을 나타내는 오류"""
+
+    failure_class = "circuit_open"
+
+
+class CircuitBreaker:
+    """백엔드 호출 경로에 두는 circuit breaker
+
+    호출 전에 check(), 호출 후 on_success()/on_failure(실패 종류)를 부르고,
+    CircuitOpenError를 받은 호출자는 gave_up이 아니면 wait_ready()로 다시 보낼
+    수 있을 때까지 기다림. check()가 True를 반환한 시험 요청이 결과 없이 취소되면
+    abort_probe()를 불러야 함.
+    """
+
+    def __init__(
+        self,
+        failure_threshold=5,
+        reset_timeout=30.0,
+        max_reset_timeout=300.0,
+        max_failed_probes=None,
+        stats=None,
+    ):
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.max_failed_probes = max_failed_probes
+        self.stats = stats
+        self.reset_timeout = reset_timeout
+        self.consecutive_failures = 0
+        self.failed_probes = 0
+        self._state = CLOSED
+        self._opened_until = 0.0
+        self._probing = False
+        self._changed = asyncio.Event()
+
+    @property
+    def state(self):
+        if self._state == OPEN and time.monotonic() >= self._opened_until:
+            self._set_state(HALF_OPEN)
+        return self._state
+
+    @property
+    def gave_up(self):
+        """시험 요청이 연속 max_failed_probes번 실패해 복구를 기다리지 않는 상태인지"""
+        return (
+            self.max_failed_probes is not None
+            and self.failed_probes >= self.max_failed_probes
+        )
+
+    def _set_state(self, state):
+        if state == self._state:
+            return
+        logger.info(f"circuit breaker {self._state} -> {state}")
+        self._state = state
+        self._probing = False
+        if self.stats is not None:
+            self.stats.incr(f"circuit.{state}")
+        self._notify()
+
+    def _notify(self):
+        # 기다리는 호출자를 깨우고 다음 변경을 위한 이벤트를 새로 만듦
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _open(self):
+        self._opened_until = time.monotonic() + self.reset_timeout
+        logger.warning(
+            f"API 장애로 판단하여 {self.reset_timeout:g}초 동안 요청을 중단합니다."
+        )
+        self._set_state(OPEN)
+
+    def check(self):
+        """요청을 보내도 되는지 확인 (안 되면 CircuitOpenError)
+
+        이 요청이 half_open 상태의 시험 요청이면 True를 반환함.
+        """
+        state = self.state
+        if state == CLOSED:
+            return False
+        if state == HALF_OPEN and not self._probing:
+            self._probing = True
+            if self.stats is not None:
+                self.stats.incr("circuit.probe")
+            return True
+        raise CircuitOpenError(f"circuit breaker가 {state} 상태입니다.")
+
+    def abort_probe(self):
+        """시험 요청이 결과 없이 취소되었음을 알림 (다른 요청이 시험하도록 넘김)"""
+        if self._state == HALF_OPEN and self._probing:
+            self._probing = False
+            if self.stats is not None:
+                self.stats.incr("circuit.probe_aborted")
+            self._notify()
+
+    def on_success(self):
+        """요청이 서버에 도달해 응답을 받았음을 알림"""
+        self.consecutive_failures = 0
+        self.failed_probes = 0
+        if self._state != CLOSED:
+            self.reset_timeout = self.base_reset_timeout
+            self._set_state(CLOSED)
+
+    def on_failure(self, failure):
+        """요청이 failure 종류로 실패했음을 알림"""
+        if failure in UNKNOWN_FAILURES:
+            # 장애로도 정상 응답으로도 세지 않고, 시험 요청이었다면 다른 요청에 넘김
+            self.abort_probe()
+            return
+        if failure not in OUTAGE_FAILURES:
+            # 응답 내용 오류/영구 오류는 서버가 살아 있다는 뜻
+            self.on_success()
+            return
+
+        self.consecutive_failures += 1
+        if self._state == HALF_OPEN:
+            self.failed_probes += 1
+            if self.gave_up and self.stats is not None:
+                self.stats.incr("circuit.gave_up")
+            self.reset_timeout = min(self.max_reset_timeout, self.reset_timeout * 2)
+            self._open()
+        elif (
+            self._state == CLOSED
+            and self.consecutive_failures >= self.failure_threshold
+        ):
+            self._open()
+
+    async def wait_ready(self):
+        """closed가 되거나 시험 요청을 보낼 수 있거나 gave_up이 될 때까지 대기"""
+        while True:
+            state = self.state
+            if state == CLOSED or (state == HALF_OPEN and not self._probing):
+                return
+            if self.gave_up:
+                return
+            timeout = None
+            if state == OPEN:
+                timeout = max(0.0, self._opened_until - time.monotonic())
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except TimeoutError:
+                pass
@@ -0,0 +1,159 @@
+"""API 응답 상태에 따라 동시 요청 수를 조절하는 AIMD 제한기
+
+요청이 성공하고 지연 시간이 안정적이면 창(window)을 조금씩 늘리고(additive
+increase), 429/RESOURCE_EXHAUSTED 또는 꼬리 지연 시간 증가가 보이면 창을 비율로
+줄임(multiplicative decrease). 한 extractor가 처리하는 모든 문서가 같은 제한기를
+공유함.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# 창을 줄일 때 곱하는 비율
+DEFAULT_BACKOFF_RATIO = 0.5
+# 최근 p90 지연 시간이 기준 지연 시간의 이 배수를 넘으면 창을 줄임
+DEFAULT_LATENCY_TOLERANCE = 2.0
+# 꼬리 지연 시간을 계산할 최근 요청 수
+DEFAULT_SAMPLE_WINDOW = 20
+# 기준 지연 시간(지수 이동 평균)의 갱신 비율
+BASELINE_ALPHA = 0.05
+
+THROTTLE_MARKERS = ("429", "resource_exhausted", "quota", "rate limit")
+
+
+def is_throttle_error(error):
+    """429/RESOURCE_EXHAUSTED 계열의 할당량 초과 오류인지"""
+    if getattr(error, "code", None) == 429:
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in THROTTLE_MARKERS)
+
+
+class AdaptiveConcurrencyLimiter:
+    """asyncio.Semaphore 대신 쓰는 AIMD 동시 처리 제한기
+
+    acquire/release 또는 async with로 슬롯을 사용하고, 요청 결과는
+    on_success/on_throttle로 알려줌. 현재 창 크기는 window 속성으로 확인함.
+    """
+
+    def __init__(
+        self,
+        initial_limit=5,
+        min_limit=1,
+        max_limit=32,
+        backoff_ratio=DEFAULT_BACKOFF_RATIO,
+        latency_tolerance=DEFAULT_LATENCY_TOLERANCE,
+        sample_window=DEFAULT_SAMPLE_WINDOW,
+        stats=None,
+    ):
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError(
+                "동시 처리 한도는 1 <= min_limit <= initial_limit <= max_limit 이어야 합니다."
+            )
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.stats = stats
+        self.in_flight = 0
+        self._limit = float(initial_limit)
+        self._latencies = deque(maxlen=sample_window)
+        self._baseline = None
+        self._last_decrease_at = 0.0
+        self._condition = asyncio.Condition()
+
+    @property
+    def window(self):
+        """현재 허용하는 동시 요청 수"""
+        return int(self._limit)
+
+    async def acquire(self):
+        """슬롯이 빌 때까지 기다린 뒤 슬롯을 확보"""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.window)
+            self.in_flight += 1
+
+    def release(self):
+        """확보한 슬롯을 반환"""
+        self.in_flight -= 1
+        self._notify()
+
+    async def while_released(self, awaitable):
+        """확보한 슬롯을 잠시 반납한 채 awaitable을 기다린 뒤 다시 확보
+
+        대기 중 취소되면 슬롯을 기다리지 않고 개수만 되돌려, 호출자가 평소처럼
+        release()로 반납할 수 있게 함.
+        """
+        self.release()
+        try:
+            result = await awaitable
+        except BaseException:
+            self.in_flight += 1
+            raise
+        try:
+            await self.acquire()
+        except asyncio.CancelledError:
+            self.in_flight += 1
+            raise
+        return result
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+    def _notify(self):
+        async def notify():
+            async with self._condition:
+                self._condition.notify_all()
+
+        asyncio.ensure_future(notify())
+
+    def _set_limit(self, limit, reason):
+        old_window = self.window
+        self._limit = min(float(self.max_limit), max(float(self.min_limit), limit))
+        if self.window != old_window:
+            logger.info(f"동시 처리 창 {old_window} -> {self.window} ({reason})")
+            if self.stats is not None:
+                self.stats.observe("concurrency.window", self.window)
+            self._notify()
+
+    def _decrease(self, started_at, reason):
+        """창을 줄임 (이미 줄인 뒤에 시작된 요청의 신호만 반영)"""
+        if started_at < self._last_decrease_at:
+            return
+        self._last_decrease_at = time.monotonic()
+        if self.stats is not None:
+            self.stats.incr(f"concurrency.decrease.{reason}")
+        self._set_limit(self._limit * self.backoff_ratio, reason)
+
+    def on_success(self, started_at):
+        """time.monotonic() 기준 started_at에 시작한 요청이 성공했음을 알림"""
+        latency = time.monotonic() - started_at
+        self._latencies.append(latency)
+        if self._baseline is None:
+            self._baseline = latency
+        else:
+            self._baseline += BASELINE_ALPHA * (latency - self._baseline)
+
+        if len(self._latencies) == self._latencies.maxlen:
+            ordered = sorted(self._latencies)
+            p90 = ordered[int(0.9 * (len(ordered) - 1))]
+            if p90 > self._baseline * self.latency_tolerance:
+                self._latencies.clear()
+                self._decrease(started_at, "latency")
+                return
+
+        # 창을 거의 다 쓰고 있을 때만 늘림 (창 하나 분량 성공마다 +1)
+        if self.in_flight + 1 >= self.window:
+            self._set_limit(self._limit + 1 / self._limit, "increase")
+
+    def on_throttle(self, started_at):
+        """요청이 429/RESOURCE_EXHAUSTED로 거절되었음을 알림"""
+        self._decrease(started_at, "throttle")
@@ -0,0 +1,53 @@
+"""이벤트 루프 밖에서 동기(CPU) 작업을 실행하는 단계"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ExecutorStage:
+    """동기 작업을 전용 스레드 풀에서 실행하고 대기열 깊이를 추적
+
+    stats가 주어지면 제출 시점의 대기 작업 수(depth)와 실행 시작까지
+    기다린 시간(queue_wait_s)을 기록함.
+    """
+
+    def __init__(self, name, max_workers, stats=None):
+        self.name = name
+        self.max_workers = max_workers
+        self.stats = stats
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f"{name}-stage"
+        )
+
+    @property
+    def queue_depth(self):
+        """실행을 기다리는(워커를 배정받지 못한) 작업 수"""
+        return max(0, self.pending - self.max_workers)
+
+    async def run(self, func, *args, **kwargs):
+        """func(*args, **kwargs)를 실행기에서 실행하고 결과를 반환"""
+        loop = asyncio.get_running_loop()
+        submitted_at = time.monotonic()
+
+        def call():
+            started_at = time.monotonic()
+            return started_at, func(*args, **kwargs)
+
+        self.pending += 1
+        if self.stats is not None:
+            self.stats.observe(f"executor.{self.name}.depth", self.queue_depth)
+        try:
+            started_at, result = await loop.run_in_executor(self._executor, call)
+        finally:
+            self.pending -= 1
+
+        if self.stats is not None:
+            self.stats.observe(
+                f"executor.{self.name}.queue_wait_s", started_at - submitted_at
+            )
+        return result
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,551 @@
+"""generate_content를 흉내 내는 로컬 Gemini 대역 서버
+
+실제 API 없이 부하 테스트, 벤치마크, CI를 돌리기 위한 서버임. 지연 시간 분포,
+429/500 비율, 잘린 응답/잘못된 JSON 비율을 설정할 수 있고, 응답 내용은
+요청(PDF 텍스트 레이어)으로부터 결정적으로 만들어짐.
+
+사용 예:
+    uv run fake_gemini_server.py --port 8080 --latency lognormal:3,0.5 --rate_429 0.05
+    uv run simple_pdf_parser.py sample.pdf --backend_url http://127.0.0.1:8080
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import fitz
+
+logger = logging.getLogger(__name__)
+
+GENERATE_PATH = re.compile(
+    r"^/v1beta/models/(?P<model>[^/:]+)"
+    r":(?P<method>generateContent|streamGenerateContent)$"
+)
+# 스트리밍 응답 조각 하나에 담는 글자 수
+STREAM_PIECE_CHARS = 256
+CACHES_PATH = "/v1beta/cachedContents"
+CACHE_PATH = re.compile(r"^/v1beta/(?P<name>cachedContents/[^/:]+)$")
+TTL_PATTERN = re.compile(r"^([\d.]+)s$")
+TEXT_PAGE_MARKER = re.compile(r"^\[page_index: \d+\]")
+
+PDF_PAGE_TOKENS = 258
+IMAGE_TOKENS = 258
+CHARS_PER_TOKEN = 2
+
+
+def parse_latency(spec):
+    """지연 시간 분포 문자열을 rng를 받아 초 단위 지연을 반환하는 함수로 변환
+
+    fixed:초 | uniform:최소,최대 | lognormal:중앙값,sigma
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed":
+        (seconds,) = values
+        return lambda rng: seconds
+    if kind == "uniform":
+        low, high = values
+        return lambda rng: rng.uniform(low, high)
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda rng: rng.lognormvariate(math.log(median), sigma)
+    raise ValueError(f"알 수 없는 지연 시간 분포입니다: {spec}")
+
+
+@dataclass
+class FakeGeminiConfig:
+    """대역 서버 동작 설정 (비율은 0~1)"""
+
+    latency: object = field(default_factory=lambda: parse_latency("fixed:0"))
+    rate_429: float = 0.0
+    rate_500: float = 0.0
+    rate_truncated: float = 0.0
+    rate_invalid_json: float = 0.0
+    retry_delay: float = 2.0
+    min_cache_tokens: int = 0
+    seed: int = 0
+
+
+def _page_texts(mime_type, data):
+    """inline 데이터 하나에 들어 있는 페이지별 텍스트 목록"""
+    if mime_type == "application/pdf":
+        with fitz.open(stream=data, filetype="pdf") as doc:
+            return [page.get_text("text") for page in doc]
+    return [""]
+
+
+def _field(mapping, name):
+    """camelCase 이름의 필드 값 (클라이언트가 snake_case로 보낸 경우 포함)"""
+    if name in mapping:
+        return mapping[name]
+    return mapping.get(re.sub(r"[A-Z]", lambda m: "_" + m.group().lower(), name))
+
+
+def _text_tokens(content):
+    """Content(systemInstruction 등)에 든 텍스트의 토큰 추정치"""
+    parts = (content or {}).get("parts", [])
+    return sum(len(part.get("text", "")) for part in parts) // CHARS_PER_TOKEN
+
+
+def _request_pages(body):
+    """요청 본문에서 페이지별 텍스트와 입력 토큰 추정치를 구함"""
+    pages = []
+    text_pages = []
+    prompt_chars = 0
+    tokens = _text_tokens(_field(body, "systemInstruction"))
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            inline = _field(part, "inlineData")
+            if "text" in part:
+                prompt_chars += len(part["text"])
+                if TEXT_PAGE_MARKER.match(part["text"]):
+                    text_pages.append(part["text"].split("\n", 1)[-1])
+            elif inline is not None:
+                mime_type = _field(inline, "mimeType") or ""
+                data = _decode_base64(inline.get("data", ""))
+                page_texts = _page_texts(mime_type, data)
+                pages.extend(page_texts)
+                if mime_type == "application/pdf":
+                    tokens += PDF_PAGE_TOKENS * len(page_texts)
+                else:
+                    tokens += IMAGE_TOKENS
+
+    # 추출 텍스트 형식 요청은 축소 이미지가 아니라 텍스트 블록이 페이지임
+    if text_pages:
+        pages = text_pages
+    tokens += prompt_chars // CHARS_PER_TOKEN
+    return pages, tokens
+
+
+def _decode_base64(data):
+    """표준/URL-safe base64를 모두 디코딩 (패딩이 빠진 경우 포함)"""
+    data = data.replace("-", "+").replace("_", "/")
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+
+def _ttl_seconds(body):
+    """요청의 ttl("3600s")을 초 단위로 변환 (없으면 1시간)"""
+    match = TTL_PATTERN.match(str(body.get("ttl", "")))
+    return float(match.group(1)) if match else 3600.0
+
+
+def build_items(pages):
+    """페이지별 텍스트로부터 결정적인 추출 결과 항목을 생성"""
+    items = []
+    for i, text in enumerate(pages):
+        digest = hashlib.sha256(f"{i}:{text}".encode("utf-8")).hexdigest()
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        items.append(
+            {
+                "type": "sub_title",
+                "page_index": i,
+                "content": lines[0] if lines else f"섹션 {digest[:6]}",
+                "is_incomplete": False,
+            }
+        )
+        body = " ".join(lines[1:]) or f"합성 문단 {digest[:16]}."
+        items.append(
+            {
+                "type": "paragraph",
+                "page_index": i,
+                "content": body,
+                "is_incomplete": not body.endswith((".", "다")),
+            }
+        )
+    return items
+
+
+def compact_items(items):
+    """항목을 압축 스키마({"t", "p", "c", "i"}, t는 한 글자) 형식으로 변환"""
+    return [
+        {
+            "t": item["type"][0],
+            "p": item["page_index"],
+            "c": item["content"],
+            "i": item["is_incomplete"],
+        }
+        for item in items
+    ]
+
+
+class FakeGemini:
+    """요청을 받아 (상태 코드, 헤더, 응답 본문)을 만드는 대역 로직"""
+
+    def __init__(self, config):
+        self.config = config
+        self.counters = Counter()
+        # cached content 이름 -> {"model", "tokens", "expires_at"}
+        self.caches = {}
+        self._rng = random.Random(config.seed)
+        self._lock = threading.Lock()
+
+    def _draw(self):
+        """실패 종류를 고를 난수와 지연 시간을 뽑음"""
+        with self._lock:
+            rng = self._rng
+            return rng.random(), rng.random(), self.config.latency(rng)
+
+    def _count(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def _error(self, code, status, message, headers=None, details=None):
+        error = {"code": code, "message": message, "status": status}
+        if details:
+            error["details"] = details
+        return code, headers or {}, {"error": error}
+
+    def cache_resource(self, name):
+        cache = self.caches[name]
+        expire_time = time.strftime(
+            "%Y-%m-%dT%H:%M:%SZ",
+            time.gmtime(time.time() + cache["expires_at"] - time.monotonic()),
+        )
+        return {
+            "name": name,
+            "model": cache["model"],
+            "displayName": cache["display_name"],
+            "expireTime": expire_time,
+            "usageMetadata": {"totalTokenCount": cache["tokens"]},
+        }
+
+    def _live_cache(self, name):
+        cache = self.caches.get(name)
+        if cache is None or cache["expires_at"] <= time.monotonic():
+            self.caches.pop(name, None)
+            return None
+        return cache
+
+    def create_cache(self, body):
+        """cachedContents 생성 요청을 처리"""
+        self._count("cache_create")
+        tokens = _text_tokens(_field(body, "systemInstruction"))
+        for content in body.get("contents", []):
+            tokens += _text_tokens(content)
+        if tokens < self.config.min_cache_tokens:
+            return self._error(
+                400,
+                "INVALID_ARGUMENT",
+                f"Cached content is too small. total_token_count={tokens}, "
+                f"min_total_token_count={self.config.min_cache_tokens}",
+            )
+        name = f"cachedContents/{hashlib.sha256(os.urandom(16)).hexdigest()[:12]}"
+        with self._lock:
+            self.caches[name] = {
+                "model": body.get("model", ""),
+                "display_name": _field(body, "displayName") or "",
+                "tokens": tokens,
+                "expires_at": time.monotonic() + _ttl_seconds(body),
+            }
+            return 200, {}, self.cache_resource(name)
+
+    def update_cache(self, name, body):
+        """cachedContents TTL 연장 요청을 처리"""
+        self._count("cache_update")
+        with self._lock:
+            if self._live_cache(name) is None:
+                return self._error(404, "NOT_FOUND", f"{name} not found.")
+            self.caches[name]["expires_at"] = time.monotonic() + _ttl_seconds(body)
+            return 200, {}, self.cache_resource(name)
+
+    def delete_cache(self, name):
+        """cachedContents 삭제 요청을 처리"""
+        self._count("cache_delete")
+        with self._lock:
+            if self.caches.pop(name, None) is None:
+                return self._error(404, "NOT_FOUND", f"{name} not found.")
+        return 200, {}, {}
+
+    def respond(self, model, body):
+        """(지연 시간, (상태 코드, 헤더, 응답 본문))을 반환 (대기하지 않음)"""
+        self._count("requests")
+        roll, cut, latency = self._draw()
+        return max(0.0, latency), self._respond(model, body, roll, cut)
+
+    def generate(self, model, body):
+        """generateContent 요청을 처리 (지연 시간만큼 대기한 뒤 응답)"""
+        latency, response = self.respond(model, body)
+        time.sleep(latency)
+        return response
+
+    def _respond(self, model, body, roll, cut):
+        config = self.config
+        if roll < config.rate_429:
+            self._count("status_429")
+            delay = f"{config.retry_delay:g}s"
+            return self._error(
+                429,
+                "RESOURCE_EXHAUSTED",
+                "Resource has been exhausted (e.g. check quota).",
+                headers={"Retry-After": f"{math.ceil(config.retry_delay)}"},
+                details=[
+                    {
+                        "@type": "type.googleapis.com/google.rpc.RetryInfo",
+                        "retryDelay": delay,
+                    }
+                ],
+            )
+        roll -= config.rate_429
+        if roll < config.rate_500:
+            self._count("status_500")
+            return self._error(500, "INTERNAL", "Internal error encountered.")
+        roll -= config.rate_500
+
+        cached_tokens = 0
+        cached_content = _field(body, "cachedContent")
+        if cached_content:
+            with self._lock:
+                cache = self._live_cache(cached_content)
+            if cache is None:
+                self._count("status_404")
+                return self._error(404, "NOT_FOUND", f"{cached_content} not found.")
+            cached_tokens = cache["tokens"]
+
+        pages, prompt_tokens = _request_pages(body)
+        prompt_tokens += cached_tokens
+        items = build_items(pages)
+        generation_config = _field(body, "generationConfig") or {}
+        schema = _field(generation_config, "responseSchema") or {}
+        if "d" in schema.get("properties", {}):
+            # 압축 스키마 요청이면 짧은 키로 응답
+            text = json.dumps({"d": compact_items(items)}, ensure_ascii=False)
+        else:
+            text = json.dumps({"data": items}, ensure_ascii=False)
+        finish_reason = "STOP"
+        if roll < config.rate_truncated:
+            self._count("truncated")
+            text = text[: max(1, int(len(text) * cut))]
+            finish_reason = "MAX_TOKENS"
+        elif roll - config.rate_truncated < config.rate_invalid_json:
+            self._count("invalid_json")
+            text = f"```json\n{text}\n```"
+        else:
+            self._count("ok")
+
+        output_tokens = len(text) // CHARS_PER_TOKEN
+        return (
+            200,
+            {},
+            {
+                "candidates": [
+                    {
+                        "content": {"parts": [{"text": text}], "role": "model"},
+                        "finishReason": finish_reason,
+                        "index": 0,
+                    }
+                ],
+                "usageMetadata": {
+                    "promptTokenCount": prompt_tokens,
+                    "cachedContentTokenCount": cached_tokens,
+                    "candidatesTokenCount": output_tokens,
+                    "totalTokenCount": prompt_tokens + output_tokens,
+                },
+                "modelVersion": model,
+            },
+        )
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    """FakeGemini를 HTTP로 노출하는 요청 핸들러"""
+
+    server_version = "FakeGemini/1.0"
+    fake = None
+
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            # 클라이언트가 응답을 받기 전에 연결을 끊음 (제한 시간 초과, 요청 취소)
+            logger.debug("클라이언트가 연결을 끊었습니다.")
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _not_found(self):
+        self._send_json(404, {"error": {"code": 404, "status": "NOT_FOUND"}})
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        match = CACHE_PATH.match(path)
+        if path == "/stats":
+            self._send_json(200, dict(self.fake.counters))
+        elif match and match.group("name") in self.fake.caches:
+            self._send_json(200, self.fake.cache_resource(match.group("name")))
+        else:
+            self._not_found()
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0]
+        if path == CACHES_PATH:
+            status, headers, payload = self.fake.create_cache(self._read_json())
+            self._send_json(status, payload, headers)
+            return
+        match = GENERATE_PATH.match(path)
+        if not match:
+            self._not_found()
+            return
+        if match.group("method") == "streamGenerateContent":
+            self._stream(match.group("model"), self._read_json())
+            return
+        status, headers, payload = self.fake.generate(
+            match.group("model"), self._read_json()
+        )
+        self._send_json(status, payload, headers)
+
+    def _stream(self, model, body):
+        """응답 텍스트를 조각으로 나눠 SSE(data: ...)로 전송
+
+        지연 시간은 조각 사이에 나눠서 대기하고, 토큰 사용량과 종료 사유는
+        마지막 조각에 담음.
+        """
+        latency, (status, headers, payload) = self.fake.respond(model, body)
+        if status != 200:
+            time.sleep(latency)
+            self._send_json(status, payload, headers)
+            return
+
+        candidate = payload["candidates"][0]
+        text = candidate["content"]["parts"][0]["text"]
+        pieces = [
+            text[i : i + STREAM_PIECE_CHARS]
+            for i in range(0, len(text), STREAM_PIECE_CHARS)
+        ] or [""]
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for index, piece in enumerate(pieces):
+            time.sleep(latency / len(pieces))
+            last = index == len(pieces) - 1
+            chunk = {
+                "candidates": [
+                    {
+                        "content": {"parts": [{"text": piece}], "role": "model"},
+                        "index": 0,
+                    }
+                ],
+                "modelVersion": payload["modelVersion"],
+            }
+            if last:
+                chunk["candidates"][0]["finishReason"] = candidate["finishReason"]
+                chunk["usageMetadata"] = payload["usageMetadata"]
+            data = json.dumps(chunk, ensure_ascii=False)
+            self.wfile.write(f"data: {data}\r\n\r\n".encode("utf-8"))
+            self.wfile.flush()
+
+    def do_PATCH(self):
+        match = CACHE_PATH.match(self.path.split("?", 1)[0])
+        if not match:
+            self._not_found()
+            return
+        status, headers, payload = self.fake.update_cache(
+            match.group("name"), self._read_json()
+        )
+        self._send_json(status, payload, headers)
+
+    def do_DELETE(self):
+        match = CACHE_PATH.match(self.path.split("?", 1)[0])
+        if not match:
+            self._not_found()
+            return
+        status, headers, payload = self.fake.delete_cache(match.group("name"))
+        self._send_json(status, payload, headers)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+def make_server(host, port, config):
+    """대역 서버를 만듦 (port가 0이면 빈 포트 사용, 대역 로직은 server.fake)"""
+    fake = FakeGemini(config)
+    handler = type("Handler", (FakeGeminiHandler,), {"fake": fake})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.fake = fake
+    return server
+
+
+def serve(host, port, config):
+    """대역 서버를 실행 (Ctrl+C로 종료)"""
+    server = make_server(host, port, config)
+    logger.info(f"Gemini 대역 서버 시작: http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info(f"Gemini 대역 서버 종료: {dict(server.fake.counters)}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format="[%(asctime)s] %(levelname)s - %(message)s"
+    )
+
+    parser = argparse.ArgumentParser(description="로컬 Gemini 대역 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--latency",
+        default="fixed:0",
+        help="지연 시간 분포. fixed:초 | uniform:최소,최대 | lognormal:중앙값,sigma",
+    )
+    parser.add_argument("--rate_429", type=float, default=0.0, help="429 응답 비율")
+    parser.add_argument("--rate_500", type=float, default=0.0, help="500 응답 비율")
+    parser.add_argument(
+        "--rate_truncated", type=float, default=0.0, help="중간에 잘린 JSON 응답 비율"
+    )
+    parser.add_argument(
+        "--rate_invalid_json",
+        type=float,
+        default=0.0,
+        help="코드 블록으로 감싼(파싱 불가) JSON 응답 비율",
+    )
+    parser.add_argument(
+        "--retry_delay", type=float, default=2.0, help="429 응답의 재시도 대기 힌트(초)"
+    )
+    parser.add_argument(
+        "--min_cache_tokens",
+        type=int,
+        default=0,
+        help="cached content 생성에 필요한 최소 토큰 수 (실제 API는 1024 이상)",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="난수 시드")
+    args = parser.parse_args()
+
+    serve(
+        args.host,
+        args.port,
+        FakeGeminiConfig(
+            latency=parse_latency(args.latency),
+            rate_429=args.rate_429,
+            rate_500=args.rate_500,
+            rate_truncated=args.rate_truncated,
+            rate_invalid_json=args.rate_invalid_json,
+            retry_delay=args.retry_delay,
+            min_cache_tokens=args.min_cache_tokens,
+            seed=args.seed,
+        ),
+    )
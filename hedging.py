@@ -0,0 +1,88 @@
+"""오래 걸리는 요청에 중복 요청을 보내 꼬리 지연 시간을 줄이는 hedging 정책
+
+요청이 최근 지연 시간의 quantile 분위수보다 오래 걸리면 같은 요청을 한 번 더
+보내고, 먼저 성공한 쪽의 결과를 사용한 뒤 나머지는 취소함. 중복 요청 비율은
+max_ratio를 넘지 않게 하여 할당량을 낭비하지 않음.
+"""
+
+import asyncio
+from collections import deque
+
+# 분위수를 계산할 최근 성공 요청 수
+DEFAULT_SAMPLE_WINDOW = 200
+# 분위수를 믿을 수 있을 만큼 모일 때까지는 중복 요청을 보내지 않음
+MIN_SAMPLES = 20
+
+
+class HedgePolicy:
+    """요청 지연 시간을 기록하고 필요하면 중복 요청을 보내는 정책"""
+
+    def __init__(
+        self,
+        quantile=0.95,
+        max_ratio=0.05,
+        sample_window=DEFAULT_SAMPLE_WINDOW,
+        stats=None,
+    ):
+        self.quantile = quantile
+        self.max_ratio = max_ratio
+        self.stats = stats
+        self.requests = 0
+        self.hedged = 0
+        self._latencies = deque(maxlen=sample_window)
+
+    def record(self, latency):
+        """성공한 요청의 지연 시간(초)을 기록"""
+        self._latencies.append(latency)
+
+    def hedge_delay(self):
+        """중복 요청을 보내기 전까지 기다릴 시간 (보내지 않으면 None)"""
+        if self.max_ratio <= 0 or len(self._latencies) < MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(self.quantile * len(ordered)))]
+
+    def _within_budget(self):
+        return self.hedged + 1 <= self.requests * self.max_ratio
+
+    async def run(self, send):
+        """send(hedged)로 요청을 보내고, 늦어지면 중복 요청을 보내 먼저 성공한 결과를 반환
+
+        send는 hedged(중복 요청 여부)를 받아 코루틴을 반환하는 함수.
+        """
+        self.requests += 1
+        primary = asyncio.ensure_future(send(False))
+        delay = self.hedge_delay()
+        if delay is None:
+            return await primary
+
+        try:
+            done, _pending = await asyncio.wait({primary}, timeout=delay)
+        except BaseException:
+            primary.cancel()
+            raise
+        if done or not self._within_budget():
+            return await primary
+
+        self.hedged += 1
+        if self.stats is not None:
+            self.stats.incr("hedge.sent")
+            self.stats.observe("hedge.delay_s", delay)
+        hedge = asyncio.ensure_future(send(True))
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if not task.cancelled() and task.exception() is None:
+                        if task is hedge and self.stats is not None:
+                            self.stats.incr("hedge.won")
+                        return task.result()
+            # 둘 다 실패하면 원래 요청의 오류를 전달
+            return primary.result()
+        finally:
+            for task in (primary, hedge):
+                if not task.done():
+                    task.cancel()
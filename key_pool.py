@@ -0,0 +1,141 @@
+"""여러 API 키(프로젝트)에 요청을 나눠 보내는 키 풀
+
+키마다 백엔드와 RPM/TPM 제한기를 따로 두고, 요청마다 남은 한도 비율이 가장
+큰 키를 고름. 429/RESOURCE_EXHAUSTED를 받은 키는 잠시 쉬게 하고(cooldown) 그동안
+다른 키로 요청을 보냄. 키별 요청/토큰/할당량 초과 횟수는 key.<이름>.* 통계로
+기록함.
+"""
+
+import asyncio
+import logging
+import time
+
+from rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# 할당량 초과 응답에 재시도 힌트가 없을 때 키를 쉬게 하는 시간(초)
+DEFAULT_COOLDOWN = 30.0
+
+
+def key_label(index, api_key):
+    """로그와 통계에 쓰는 키 이름 (키 전체는 남기지 않음)"""
+    return f"{index}-{api_key[-4:]}" if api_key else str(index)
+
+
+class PoolMember:
+    """키 하나의 백엔드, 한도, 쉬는 시간 상태"""
+
+    def __init__(self, label, backend, rate_limiter):
+        self.label = label
+        self.backend = backend
+        self.rate_limiter = rate_limiter
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+
+    def ready(self, now):
+        return self.cooldown_until <= now
+
+
+class KeyPool:
+    """남은 한도가 가장 큰 키를 골라 요청을 보내는 풀
+
+    키가 하나면 단일 백엔드와 같게 동작함. 한도(tier/rpm/tpm)는 키마다 따로 적용됨.
+    """
+
+    def __init__(self, members, cooldown=DEFAULT_COOLDOWN, stats=None):
+        if not members:
+            raise ValueError("키 풀에는 키가 하나 이상 있어야 합니다.")
+        self.members = list(members)
+        self.cooldown = cooldown
+        self.stats = stats
+
+    @classmethod
+    def from_backends(
+        cls,
+        backends,
+        tier=None,
+        rpm=None,
+        tpm=None,
+        cooldown=DEFAULT_COOLDOWN,
+        stats=None,
+    ):
+        """(이름, 백엔드) 목록으로 풀을 만듦 (한도 제한기는 키마다 따로 생성)"""
+        members = [
+            PoolMember(
+                label,
+                backend,
+                RateLimiter.for_tier(tier, rpm=rpm, tpm=tpm, stats=stats),
+            )
+            for label, backend in backends
+        ]
+        return cls(members, cooldown=cooldown, stats=stats)
+
+    def _pick(self, est_tokens, exclude=None):
+        now = time.monotonic()
+        ready = [m for m in self.members if m.ready(now) and m is not exclude]
+        if not ready:
+            ready = [m for m in self.members if m.ready(now)]
+        if not ready:
+            return None
+        return max(
+            ready,
+            key=lambda m: (m.rate_limiter.headroom(est_tokens), -m.in_flight),
+        )
+
+    async def acquire(self, est_tokens, exclude=None):
+        """요청을 보낼 키를 골라 그 키의 RPM/TPM 한도를 차감하고 반환
+
+        모든 키가 쉬는 중이면 가장 먼저 풀리는 키를 기다림. exclude로 넘긴 키는
+        다른 키가 있으면 피함 (중복 요청을 다른 키로 보낼 때 사용).
+        """
+        while (member := self._pick(est_tokens, exclude)) is None:
+            wait = min(m.cooldown_until for m in self.members) - time.monotonic()
+            if self.stats is not None:
+                self.stats.incr("key_pool.all_cooling")
+            await asyncio.sleep(max(wait, 0.0))
+        member.in_flight += 1
+        try:
+            await member.rate_limiter.acquire(est_tokens)
+        except BaseException:
+            member.in_flight -= 1
+            raise
+        if self.stats is not None:
+            self.stats.incr(f"key.{member.label}.requests")
+        return member
+
+    def release(self, member):
+        member.in_flight -= 1
+
+    def on_success(self, member, est_tokens, response):
+        """응답의 실제 토큰 수로 키의 한도를 정산하고 키별 사용량을 기록"""
+        member.rate_limiter.settle(est_tokens, response.prompt_tokens)
+        if self.stats is not None:
+            prefix = f"key.{member.label}"
+            self.stats.incr(f"{prefix}.tokens_prompt", response.prompt_tokens)
+            self.stats.incr(f"{prefix}.tokens_output", response.output_tokens)
+
+    def on_throttle(self, member, hint=None):
+        """키가 할당량 초과로 거절되었음을 알림 (힌트가 있으면 그만큼 쉼)
+
+        키가 하나뿐이면 쉬게 하지 않고 재시도 정책의 대기 시간에 맡김.
+        """
+        if self.stats is not None:
+            self.stats.incr(f"key.{member.label}.throttled")
+        if len(self.members) == 1:
+            return
+        cooldown = hint if hint is not None else self.cooldown
+        member.cooldown_until = max(member.cooldown_until, time.monotonic() + cooldown)
+        logger.warning(
+            f"키 {member.label}이(가) 할당량을 초과해 {cooldown:g}초간 쉽니다."
+        )
+
+    async def aclose(self):
+        """모든 키의 백엔드를 정리"""
+        results = await asyncio.gather(
+            *(member.backend.aclose() for member in self.members),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
@@ -0,0 +1,165 @@
+"""텍스트 레이어가 온전한 페이지를 API 없이 로컬에서 추출하는 함수 모음
+
+어떤 페이지를 로컬에서 추출할지는 page_classifier가 판단함.
+
+결과 항목은 Gemini 응답과 같은 {"type", "page_index", "content", "is_incomplete"}
+형식이므로 _merge_results와 _json_to_text를 그대로 통과함.
+"""
+
+from collections import Counter
+
+import fitz
+
+# 페이지 위/아래 이 비율 안에 있는 블록은 header/footer로 보고 제외
+HEADER_FOOTER_MARGIN = 0.06
+# 본문 글꼴보다 이 비율 이상 크면 제목으로 간주
+HEADING_SIZE_RATIO = 1.2
+HEADING_MAX_CHARS = 80
+# 문장이 끝났다고 볼 수 있는 마지막 글자
+SENTENCE_ENDINGS = tuple('.?!。:;)]」』”"') + ("다", "요", "함", "음", "임")
+# 깔끔한 표로 보기 위한 빈 셀(병합 셀 포함) 최대 비율
+MAX_EMPTY_CELL_RATIO = 0.2
+
+
+def _block_lines(block):
+    """블록의 줄을 (텍스트, 최대 글꼴 크기, 굵은 글꼴 여부) 목록으로 반환"""
+    lines = []
+    for line in block.get("lines", []):
+        spans = [span for span in line["spans"] if span["text"].strip()]
+        if not spans:
+            continue
+        text = "".join(span["text"] for span in spans).strip()
+        size = max(span["size"] for span in spans)
+        bold = all(span["flags"] & fitz.TEXT_FONT_BOLD for span in spans)
+        lines.append((text, size, bold))
+    return lines
+
+
+def _join_lines(texts):
+    """줄 바꿈을 제거하여 문단 텍스트로 합침 (하이픈으로 끊긴 단어는 붙임)"""
+    result = ""
+    for text in texts:
+        if not result:
+            result = text
+        elif result.endswith("-") and result[-2:-1].isalpha():
+            result = result[:-1] + text
+        else:
+            result = result + " " + text
+    return result
+
+
+def _cell_text(cell):
+    return (cell or "").replace("\n", " ").replace("|", "\\|").strip()
+
+
+def table_to_markdown(rows):
+    """표 행 목록을 마크다운 테이블 문자열로 변환 (첫 행을 머리글로 사용)"""
+    header, *body = [[_cell_text(cell) for cell in row] for row in rows]
+    lines = [
+        "| " + " | ".join(header) + " |",
+        "| " + " | ".join(":---" for _ in header) + " |",
+    ]
+    lines.extend("| " + " | ".join(row) + " |" for row in body)
+    return "\n".join(lines)
+
+
+def is_clean_table(rows):
+    """선으로 구분된 규칙적인 표인지 판단 (병합 셀/빈 셀이 적어야 함)"""
+    if len(rows) < 2 or len(rows[0]) < 2:
+        return False
+    if any(len(row) != len(rows[0]) for row in rows):
+        return False
+    cells = [cell for row in rows for cell in row]
+    empty = sum(1 for cell in cells if not (cell or "").strip())
+    return empty / len(cells) <= MAX_EMPTY_CELL_RATIO
+
+
+def extract_tables(page):
+    """find_tables로 찾은 표 중 깔끔한 표만 (bbox, 마크다운) 목록으로 반환"""
+    tables = []
+    for table in page.find_tables().tables:
+        rows = table.extract()
+        if is_clean_table(rows):
+            tables.append((tuple(table.bbox), table_to_markdown(rows)))
+    return tables
+
+
+def _in_any_rect(bbox, rects):
+    """bbox의 중심이 rects 중 하나에 포함되는지"""
+    x = (bbox[0] + bbox[2]) / 2
+    y = (bbox[1] + bbox[3]) / 2
+    return any(r[0] <= x <= r[2] and r[1] <= y <= r[3] for r in rects)
+
+
+def extract_page_items(page, page_index=None, tables=None):
+    """텍스트 레이어에서 sub_title/paragraph/table 항목 목록을 생성
+
+    tables는 extract_tables의 결과로, 표 영역의 텍스트 블록은 건너뛰고
+    표는 위치 순서에 맞춰 table 항목으로 넣음.
+    """
+    if page_index is None:
+        page_index = page.number
+    tables = tables or []
+    table_rects = [bbox for bbox, _markdown in tables]
+
+    page_rect = page.rect
+    top_limit = page_rect.y0 + page_rect.height * HEADER_FOOTER_MARGIN
+    bottom_limit = page_rect.y1 - page_rect.height * HEADER_FOOTER_MARGIN
+
+    blocks = []
+    size_counter = Counter()
+    text_dict = page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT, sort=True)
+    for block in text_dict["blocks"]:
+        _x0, y0, _x1, y1 = block["bbox"]
+        if y1 <= top_limit or y0 >= bottom_limit:
+            continue
+        if _in_any_rect(block["bbox"], table_rects):
+            continue
+        lines = _block_lines(block)
+        if not lines:
+            continue
+        for text, size, _bold in lines:
+            size_counter[round(size, 1)] += len(text)
+        blocks.append((y0, lines))
+
+    # 표는 위쪽 y 좌표 기준으로 텍스트 블록 사이에 끼워 넣음
+    pending_tables = sorted(tables, key=lambda t: t[0][1])
+
+    def table_item(markdown):
+        return {
+            "type": "table",
+            "page_index": page_index,
+            "content": markdown,
+            "is_incomplete": False,
+        }
+
+    body_size = size_counter.most_common(1)[0][0] if size_counter else 0
+    items = []
+    for y0, lines in blocks:
+        while pending_tables and pending_tables[0][0][1] <= y0:
+            items.append(table_item(pending_tables.pop(0)[1]))
+
+        content = _join_lines([text for text, _size, _bold in lines])
+        max_size = max(size for _text, size, _bold in lines)
+        is_heading = len(content) <= HEADING_MAX_CHARS and (
+            max_size >= body_size * HEADING_SIZE_RATIO
+            or (len(lines) == 1 and lines[0][2] and max_size >= body_size)
+        )
+        items.append(
+            {
+                "type": "sub_title" if is_heading else "paragraph",
+                "page_index": page_index,
+                "content": content,
+                "is_incomplete": False,
+            }
+        )
+
+    items.extend(table_item(markdown) for _bbox, markdown in pending_tables)
+    if not items:
+        return []
+
+    last = items[-1]
+    if last["type"] == "paragraph" and not last["content"].endswith(SENTENCE_ENDINGS):
+        last["is_incomplete"] = True
+
+    return items
@@ -0,0 +1,52 @@
+"""페이지 종류로 청크마다 모델을 고르고, 출력 검증에 실패하면 더 강한 모델로 올리는 라우터
+
+텍스트/빈 페이지로만 이루어진 청크는 가벼운 모델(flash-lite)로 보내고, 표,
+스캔, 혼합 페이지가 하나라도 있거나 종류를 모르는 청크는 강한 모델로 보냄.
+가벼운 모델의 응답이 검증에 실패하면 남은 재시도는 강한 모델로 보냄.
+
+경로(모델)별 요청 수, 지연 시간, 토큰 수는 route.<모델>.* 통계로 기록하고,
+route.<모델>.escalated 관측값의 평균이 해당 경로로 처음 보낸 청크의 상향 비율임.
+"""
+
+import page_classifier
+
+DEFAULT_LIGHT_MODEL = "gemini-2.5-flash-lite"
+
+# 가벼운 모델로 충분한 페이지 종류
+LIGHT_PAGE_KINDS = (page_classifier.PAGE_TEXT, page_classifier.PAGE_BLANK)
+
+
+class ModelRouter:
+    """청크별 모델 선택과 상향(escalation) 규칙"""
+
+    def __init__(self, light_model, strong_model, stats=None):
+        self.light_model = light_model
+        self.strong_model = strong_model
+        self.stats = stats
+
+    def choose(self, chunk):
+        """청크의 페이지 종류(chunk.page_kinds)로 처음 보낼 모델을 고름"""
+        kinds = chunk.page_kinds
+        if kinds and all(kind in LIGHT_PAGE_KINDS for kind in kinds):
+            return self.light_model
+        return self.strong_model
+
+    def escalate(self, model):
+        """model보다 강한 모델 (이미 가장 강하면 None)"""
+        if model == self.light_model and model != self.strong_model:
+            return self.strong_model
+        return None
+
+    def record_request(self, model, latency, response):
+        """경로별 요청 수, 지연 시간, 토큰 수를 기록"""
+        if self.stats is None:
+            return
+        self.stats.incr(f"route.{model}.requests")
+        self.stats.observe(f"route.{model}.latency_s", latency)
+        self.stats.incr(f"route.{model}.tokens_prompt", response.prompt_tokens)
+        self.stats.incr(f"route.{model}.tokens_output", response.output_tokens)
+
+    def record_chunk(self, initial_model, escalated):
+        """처음 고른 경로별로 청크가 상향되었는지 기록 (평균이 상향 비율)"""
+        if self.stats is not None:
+            self.stats.observe(f"route.{initial_model}.escalated", int(escalated))
@@ -0,0 +1,107 @@
+"""응답 형식을 강제하는 response_schema와 짧은 키를 쓰는 압축 스키마
+
+full     {"data": [{"type", "page_index", "content", "is_incomplete"}]}
+compact  {"d": [{"t", "p", "c", "i"}]} (t는 s/p/t 한 글자)
+
+압축 스키마 응답은 expand_result로 원래 항목 형식으로 되돌린 뒤 병합함.
+출력 토큰이 줄어 청크당 지연 시간이 짧아짐.
+"""
+
+OUTPUT_SCHEMAS = ("none", "full", "compact")
+
+ITEM_TYPES = ("sub_title", "paragraph", "table")
+COMPACT_TYPES = {"s": "sub_title", "p": "paragraph", "t": "table"}
+# 압축 키 -> 원래 키
+COMPACT_KEYS = {
+    "t": "type",
+    "p": "page_index",
+    "c": "content",
+    "i": "is_incomplete",
+}
+COMPACT_DATA_KEY = "d"
+
+COMPACT_PROMPT_NOTE = """
+[Compact Output]
+출력은 response schema의 짧은 키를 사용합니다.
+- "data" 대신 "d", "type" 대신 "t", "page_index" 대신 "p"
+- "content" 대신 "c", "is_incomplete" 대신 "i"
+- "t" 값은 sub_title이면 "s", paragraph이면 "p", table이면 "t"
+"""
+
+
+def _item_schema(keys, type_enum):
+    type_key, page_key, content_key, incomplete_key = keys
+    return {
+        "type": "OBJECT",
+        "properties": {
+            type_key: {"type": "STRING", "enum": list(type_enum)},
+            page_key: {"type": "INTEGER"},
+            content_key: {"type": "STRING"},
+            incomplete_key: {"type": "BOOLEAN"},
+        },
+        "required": list(keys),
+        "propertyOrdering": list(keys),
+    }
+
+
+def _result_schema(data_key, item_schema):
+    return {
+        "type": "OBJECT",
+        "properties": {data_key: {"type": "ARRAY", "items": item_schema}},
+        "required": [data_key],
+    }
+
+
+FULL_SCHEMA = _result_schema(
+    "data",
+    _item_schema(("type", "page_index", "content", "is_incomplete"), ITEM_TYPES),
+)
+COMPACT_SCHEMA = _result_schema(
+    COMPACT_DATA_KEY, _item_schema(tuple(COMPACT_KEYS), tuple(COMPACT_TYPES))
+)
+
+
+def response_schema(output_schema):
+    """출력 스키마 이름에 해당하는 response_schema (none이면 None)"""
+    return {"full": FULL_SCHEMA, "compact": COMPACT_SCHEMA}.get(output_schema)
+
+
+def data_key(output_schema):
+    """응답에서 항목 배열이 들어 있는 키"""
+    return COMPACT_DATA_KEY if output_schema == "compact" else "data"
+
+
+def expand_item(item):
+    """압축 항목 하나를 원래 항목 형식으로 변환"""
+    expanded = {COMPACT_KEYS.get(key, key): value for key, value in item.items()}
+    if "type" in expanded:
+        expanded["type"] = COMPACT_TYPES.get(expanded["type"], expanded["type"])
+    return expanded
+
+
+def expand_result(result_json):
+    """압축 응답 {"d": [...]}을 {"data": [...]}로 변환 (이미 원래 형식이면 그대로)"""
+    if COMPACT_DATA_KEY not in result_json:
+        return result_json
+    return {"data": [expand_item(item) for item in result_json[COMPACT_DATA_KEY]]}
+
+
+def validate_result(result_json, page_count=None):
+    """병합 전에 결과 형식을 검사하고, 잘못되었으면 ValueError를 발생
+
+    data가 항목(dict) 목록이고, 항목의 type/content 형식이 맞으며, page_index가
+    있으면 청크 페이지 수(page_count) 범위 안에 있어야 함.
+    """
+    items = result_json.get("data") if isinstance(result_json, dict) else None
+    if not isinstance(items, list):
+        raise ValueError("응답에 data 배열이 없습니다.")
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get("content"), str):
+            raise ValueError(f"content가 없는 항목이 있습니다: {item!r:.200}")
+        if item.get("type", "paragraph") not in ITEM_TYPES:
+            raise ValueError(f"알 수 없는 항목 종류입니다: {item['type']!r}")
+        page_index = item.get("page_index")
+        if page_count is not None and page_index is not None:
+            if not isinstance(page_index, int) or not 0 <= page_index < page_count:
+                raise ValueError(f"청크 범위를 벗어난 page_index입니다: {page_index!r}")
+    return result_json
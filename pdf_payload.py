@@ -0,0 +1,384 @@
+"""API로 전송할 청크 PDF를 만들고 전송 용량을 줄이는 함수 모음"""
+
+import logging
+import math
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import fitz
+
+import page_classifier
+from chunk_planner import CHARS_PER_TOKEN, PDF_PAGE_TOKENS
+
+logger = logging.getLogger(__name__)
+
+# 미사용 객체 제거/중복 제거, 스트림 압축, 콘텐츠 정리(미사용 리소스 제거)
+SLIM_SAVE_OPTIONS = {
+    "garbage": 4,
+    "deflate": True,
+    "deflate_images": True,
+    "deflate_fonts": True,
+    "clean": True,
+    "use_objstms": 1,
+}
+
+DEFAULT_JPEG_QUALITY = 75
+# 목표 해상도보다 이 비율 이상 높은 이미지만 다시 인코딩
+IMAGE_DPI_THRESHOLD_RATIO = 1.3
+
+# 전송 형식 선택 정책
+#   pdf: 항상 PDF 그대로 전송
+#   balanced: 스캔 페이지만으로 된 청크는 PDF와 래스터 이미지 중 저렴한 쪽
+#   aggressive: 스캔/혼합 페이지는 래스터 이미지, 텍스트/표 페이지는 추출 텍스트와
+#               저해상도 축소 이미지도 후보로 사용
+PAYLOAD_POLICIES = ("pdf", "balanced", "aggressive")
+DEFAULT_RENDER_DPI = 150
+# Gemini 이미지 토큰 계산: 양변 384px 이하는 258 토큰, 그 이상은 768px 타일당 258 토큰
+IMAGE_SMALL_SIDE = 384
+IMAGE_TILE_SIDE = 768
+IMAGE_TILE_TOKENS = 258
+# 업로드 1KB를 입력 토큰 1개와 같은 비용으로 보고 후보를 비교
+BYTES_PER_TOKEN = 1024
+
+IMAGE_PAYLOAD_NOTE = (
+    "아래 이미지는 PDF 페이지를 순서대로 변환한 것입니다. "
+    "각 이미지 앞의 page_index 값을 해당 페이지의 page_index로 사용하세요."
+)
+TEXT_PAYLOAD_NOTE = (
+    "아래는 PDF 페이지에서 추출한 텍스트와 레이아웃 확인용 축소 이미지입니다. "
+    "[page_index: N] 표시를 해당 페이지의 page_index로 사용하세요."
+)
+
+# 워커 프로세스마다 열어 둘 원본 문서 수
+WORKER_DOC_CACHE_SIZE = 4
+_worker_docs = OrderedDict()
+
+
+@dataclass
+class PDFChunk:
+    """API로 전송할 청크 하나 (end_page는 포함하지 않음)
+
+    data는 PDF 바이트. PDF가 아닌 전송 형식이 선택되면 data는 비우고
+    parts에 (mime_type, 내용) 목록을 담음. text/plain 내용은 str.
+    """
+
+    data: bytes
+    start_page: int
+    end_page: int
+    original_size: int = 0
+    image_bytes_saved: int = 0
+    payload_format: str = "pdf"
+    est_input_tokens: int = 0
+    parts: list = None
+    # 앞뒤 문맥 확인용으로만 포함한 페이지 수
+    context_before: int = 0
+    context_after: int = 0
+    # 문맥용을 제외한 페이지의 종류 (page_classifier 분류 결과, 모르면 None)
+    page_kinds: tuple = ()
+
+    @property
+    def core_start(self):
+        return self.start_page + self.context_before
+
+    @property
+    def core_end(self):
+        return self.end_page - self.context_after
+
+    @property
+    def context_indices(self):
+        """청크 안에서 문맥 확인용 페이지의 (0부터 시작하는) 인덱스 목록"""
+        page_count = self.end_page - self.start_page
+        return list(range(self.context_before)) + list(
+            range(page_count - self.context_after, page_count)
+        )
+
+    @property
+    def payload_parts(self):
+        """API로 보낼 (mime_type, 내용) 목록"""
+        if self.parts is not None:
+            return self.parts
+        return [("application/pdf", self.data)]
+
+    @property
+    def size(self):
+        return sum(
+            len(payload.encode("utf-8") if isinstance(payload, str) else payload)
+            for _mime_type, payload in self.payload_parts
+        )
+
+    @property
+    def page_label(self):
+        return f"{self.core_start}-{self.core_end - 1}"
+
+
+def slim_chunk_doc(chunk_doc):
+    """글꼴 서브셋과 가비지 컬렉션, 스트림 압축을 적용한 PDF 바이트를 반환"""
+    try:
+        chunk_doc.subset_fonts()
+    except Exception as e:
+        logger.debug(f"글꼴 서브셋 실패, 원본 글꼴을 유지합니다: {e}")
+
+    try:
+        return chunk_doc.tobytes(**SLIM_SAVE_OPTIONS)
+    except Exception as e:
+        logger.debug(f"압축 저장 실패, 기본 옵션으로 저장합니다: {e}")
+        return chunk_doc.tobytes(garbage=3, deflate=True)
+
+
+def downsample_images(chunk_doc, dpi, quality=DEFAULT_JPEG_QUALITY):
+    """유효 해상도가 dpi를 넘는 이미지를 줄여 JPEG로 다시 인코딩 (실패하면 False)"""
+    try:
+        chunk_doc.rewrite_images(
+            dpi_threshold=int(dpi * IMAGE_DPI_THRESHOLD_RATIO),
+            dpi_target=dpi,
+            quality=quality,
+            bitonal=False,
+        )
+    except Exception as e:
+        logger.debug(f"이미지 재인코딩 실패, 원본 이미지를 유지합니다: {e}")
+        return False
+    return True
+
+
+def redact_regions(chunk_doc, start_page, redactions):
+    """로컬에서 이미 추출한 영역을 지우고 자리 표시 문자열로 바꿈
+
+    redactions는 {원본 페이지 인덱스: [(bbox, 자리 표시 문자열), ...]} 형식.
+    """
+    for page_index, regions in redactions.items():
+        page = chunk_doc[page_index - start_page]
+        for bbox, marker in regions:
+            page.add_redact_annot(fitz.Rect(bbox), text=marker, fontsize=8)
+        page.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE)
+
+
+def image_tokens(width, height):
+    """Gemini가 이미지 하나에 쓰는 입력 토큰 추정치"""
+    if width <= IMAGE_SMALL_SIDE and height <= IMAGE_SMALL_SIDE:
+        return IMAGE_TILE_TOKENS
+    tiles = math.ceil(width / IMAGE_TILE_SIDE) * math.ceil(height / IMAGE_TILE_SIDE)
+    return tiles * IMAGE_TILE_TOKENS
+
+
+def _render_page(page, dpi, fmt, quality):
+    """페이지를 래스터 이미지로 변환하여 (mime_type, 바이트, 토큰 추정치)를 반환"""
+    pix = page.get_pixmap(dpi=dpi)
+    tokens = image_tokens(pix.width, pix.height)
+    if fmt == "png":
+        return "image/png", pix.tobytes("png"), tokens
+    return "image/jpeg", pix.tobytes("jpeg", jpg_quality=quality), tokens
+
+
+def _thumbnail(page, quality):
+    """레이아웃 확인용 축소 이미지 (긴 변 IMAGE_SMALL_SIDE px)"""
+    zoom = IMAGE_SMALL_SIDE / max(page.rect.width, page.rect.height)
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+    return pix.tobytes("jpeg", jpg_quality=quality)
+
+
+def _image_candidate(chunk_doc, start_page, page_kinds, dpi, quality):
+    """페이지마다 래스터 이미지로 보내는 후보 (parts, 토큰 추정치)"""
+    vector_kinds = (page_classifier.PAGE_TEXT, page_classifier.PAGE_TABLE)
+    parts = [("text/plain", IMAGE_PAYLOAD_NOTE)]
+    tokens = 0
+    for i, page in enumerate(chunk_doc):
+        # 글자와 선 위주 페이지는 PNG가 선명하고 작음
+        fmt = "png" if page_kinds[start_page + i] in vector_kinds else "jpeg"
+        mime_type, data, page_tokens = _render_page(page, dpi, fmt, quality)
+        parts.append(("text/plain", f"page_index: {i}"))
+        parts.append((mime_type, data))
+        tokens += page_tokens
+    return parts, tokens
+
+
+def _text_candidate(chunk_doc, quality):
+    """추출 텍스트와 축소 이미지로 보내는 후보 (parts, 토큰 추정치)"""
+    parts = [("text/plain", TEXT_PAYLOAD_NOTE)]
+    tokens = 0
+    for i, page in enumerate(chunk_doc):
+        text = page.get_text("text")
+        parts.append(("text/plain", f"[page_index: {i}]\n{text}"))
+        parts.append(("image/jpeg", _thumbnail(page, quality)))
+        tokens += int(len(text) / CHARS_PER_TOKEN) + IMAGE_TILE_TOKENS
+    return parts, tokens
+
+
+def _allowed_formats(policy, kinds):
+    """정책과 청크 페이지 종류로 허용되는 전송 형식 목록을 반환"""
+    formats = ["pdf"]
+    if policy == "pdf" or not kinds or None in kinds:
+        return formats
+
+    scanned_only = all(kind == page_classifier.PAGE_SCANNED for kind in kinds)
+    if policy == "balanced":
+        if scanned_only:
+            formats.append("image")
+        return formats
+
+    visual_kinds = (page_classifier.PAGE_SCANNED, page_classifier.PAGE_MIXED)
+    text_kinds = (page_classifier.PAGE_TEXT, page_classifier.PAGE_TABLE)
+    if all(kind in visual_kinds for kind in kinds):
+        formats.append("image")
+    if all(kind in text_kinds for kind in kinds):
+        formats.append("image")
+        formats.append("text")
+    return formats
+
+
+def compile_payload(chunk, chunk_doc, policy, page_kinds, render_dpi, quality):
+    """허용되는 전송 형식 후보를 만들어 가장 저렴한 것을 chunk에 반영
+
+    비용은 예상 입력 토큰 + 업로드 바이트 / BYTES_PER_TOKEN.
+    """
+    page_count = chunk.end_page - chunk.start_page
+    chunk.est_input_tokens = PDF_PAGE_TOKENS * page_count
+
+    kinds = [page_kinds.get(i) for i in range(chunk.start_page, chunk.end_page)]
+    formats = _allowed_formats(policy, kinds)
+    if len(formats) == 1:
+        return chunk
+
+    def cost(size, tokens):
+        return tokens + size / BYTES_PER_TOKEN
+
+    best_format = "pdf"
+    best_parts = None
+    best_tokens = chunk.est_input_tokens
+    best_cost = cost(chunk.size, best_tokens)
+    for fmt in formats[1:]:
+        if fmt == "image":
+            parts, tokens = _image_candidate(
+                chunk_doc, chunk.start_page, page_kinds, render_dpi, quality
+            )
+        else:
+            parts, tokens = _text_candidate(chunk_doc, quality)
+        candidate = PDFChunk(b"", chunk.start_page, chunk.end_page, parts=parts)
+        candidate_cost = cost(candidate.size, tokens)
+        if candidate_cost < best_cost:
+            best_format, best_parts = fmt, parts
+            best_tokens, best_cost = tokens, candidate_cost
+
+    if best_parts is not None:
+        chunk.data = b""
+        chunk.parts = best_parts
+    chunk.payload_format = best_format
+    chunk.est_input_tokens = best_tokens
+    return chunk
+
+
+def build_chunk(
+    doc,
+    start_page,
+    end_page,
+    slim=True,
+    image_dpi=None,
+    jpeg_quality=DEFAULT_JPEG_QUALITY,
+    redactions=None,
+    payload_policy="pdf",
+    page_kinds=None,
+    context_pages=0,
+):
+    """지정된 페이지 범위로 PDFChunk를 생성
+
+    image_dpi가 주어지면 그보다 해상도가 높은 이미지를 줄여서 전송함 (줄인
+    PDF가 줄이지 않은 PDF보다 작을 때만 사용하고, 그 차이를 image_bytes_saved로 기록).
+    redactions가 주어지면 해당 영역을 지운 뒤 전송함.
+    payload_policy가 pdf가 아니면 page_kinds({페이지 인덱스: 페이지 종류})를
+    보고 래스터 이미지/추출 텍스트 중 더 저렴한 전송 형식을 고름.
+    context_pages가 주어지면 범위 앞뒤로 그만큼의 페이지를 문맥용으로 덧붙임.
+    """
+    core_start, core_end = start_page, end_page
+    start_page = max(0, core_start - context_pages)
+    end_page = min(doc.page_count, core_end + context_pages)
+
+    chunk_doc = fitz.open()
+    try:
+        chunk_doc.insert_pdf(doc, from_page=start_page, to_page=end_page - 1)
+        data = chunk_doc.tobytes()
+        original_size = len(data)
+
+        if redactions:
+            redact_regions(chunk_doc, start_page, redactions)
+            data = chunk_doc.tobytes()
+
+        if slim:
+            slimmed = slim_chunk_doc(chunk_doc)
+            if len(slimmed) < len(data):
+                data = slimmed
+
+        image_bytes_saved = 0
+        if image_dpi and downsample_images(chunk_doc, image_dpi, jpeg_quality):
+            # 압축된 원본 이미지보다 JPEG가 클 수 있으므로 저장한 크기로 비교
+            if slim:
+                downsampled = slim_chunk_doc(chunk_doc)
+            else:
+                # 교체된 원본 이미지 객체만 정리
+                downsampled = chunk_doc.tobytes(garbage=1)
+            if len(downsampled) < len(data):
+                image_bytes_saved = len(data) - len(downsampled)
+                data = downsampled
+            else:
+                logger.debug(
+                    f"이미지를 줄여도 전송 용량이 줄지 않아 원본 이미지를 유지합니다 "
+                    f"({len(data):,} → {len(downsampled):,} 바이트)"
+                )
+
+        chunk = PDFChunk(
+            data=data,
+            start_page=start_page,
+            end_page=end_page,
+            original_size=original_size,
+            image_bytes_saved=image_bytes_saved,
+            context_before=core_start - start_page,
+            context_after=end_page - core_end,
+            page_kinds=tuple(
+                (page_kinds or {}).get(i) for i in range(core_start, core_end)
+            ),
+        )
+        render_dpi = image_dpi or DEFAULT_RENDER_DPI
+        return compile_payload(
+            chunk, chunk_doc, payload_policy, page_kinds or {}, render_dpi, jpeg_quality
+        )
+    finally:
+        chunk_doc.close()
+
+
+def _open_worker_doc(pdf_path):
+    """워커 프로세스에서 원본 문서를 열고 최근 사용한 몇 개를 재사용"""
+    doc = _worker_docs.pop(pdf_path, None)
+    if doc is None:
+        doc = fitz.open(pdf_path)
+    _worker_docs[pdf_path] = doc
+    while len(_worker_docs) > WORKER_DOC_CACHE_SIZE:
+        _, old_doc = _worker_docs.popitem(last=False)
+        old_doc.close()
+    return doc
+
+
+def build_chunk_file(pdf_path, start_page, end_page, out_dir, **options):
+    """워커 프로세스용: 원본 파일을 직접 열어 청크를 만들고 임시 파일로 저장
+
+    전송 내용(data, parts)은 결과 pickle에 싣지 않고 파일로 넘기며, 반환하는
+    PDFChunk에서는 비워 둠. (chunk, 파일 경로)를 반환.
+    """
+    doc = _open_worker_doc(pdf_path)
+    chunk = build_chunk(doc, start_page, end_page, **options)
+    fd, path = tempfile.mkstemp(
+        prefix=f"chunk_{start_page:05d}_", suffix=".bin", dir=out_dir
+    )
+    with os.fdopen(fd, "wb") as f:
+        pickle.dump((chunk.data, chunk.parts), f, protocol=pickle.HIGHEST_PROTOCOL)
+    chunk.data = b""
+    chunk.parts = None
+    return chunk, path
+
+
+def load_chunk_file(chunk, path):
+    """build_chunk_file이 저장한 전송 내용을 읽어 채우고 임시 파일을 삭제"""
+    with open(path, "rb") as f:
+        chunk.data, chunk.parts = pickle.load(f)
+    os.remove(path)
+    return chunk
@@ -0,0 +1,118 @@
+"""분당 요청 수(RPM)와 분당 토큰 수(TPM) 한도를 지키는 토큰 버킷 제한기
+
+요청 전에 예상 입력 토큰을 차감하고, 응답을 받은 뒤 usage_metadata의 실제
+토큰 수와의 차이를 정산함. 한 extractor가 처리하는 모든 문서가 공유함.
+"""
+
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# 프로젝트 등급별 gemini-2.5-flash 기본 한도 (RPM, 입력 TPM)
+TIER_LIMITS = {
+    "free": (10, 250_000),
+    "tier1": (1_000, 1_000_000),
+    "tier2": (2_000, 3_000_000),
+    "tier3": (10_000, 8_000_000),
+}
+# 한도 바로 아래에서 동작하도록 한도의 이 비율만 사용
+DEFAULT_HEADROOM = 0.95
+
+
+class TokenBucket:
+    """분당 rate_per_minute만큼 채워지는 토큰 버킷 (정산 결과로 음수가 될 수 있음)"""
+
+    def __init__(self, rate_per_minute):
+        self.capacity = float(rate_per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self._updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(
+            self.capacity, self.level + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    def wait_time(self, amount):
+        """amount만큼 꺼낼 수 있을 때까지 기다려야 하는 시간(초)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self._refill()
+        self.level -= amount
+
+
+class RateLimiter:
+    """RPM/TPM 버킷이 모두 허용할 때까지 요청을 대기시키는 제한기
+
+    rpm/tpm이 None이면 해당 한도는 적용하지 않음.
+    """
+
+    def __init__(self, rpm=None, tpm=None, headroom=DEFAULT_HEADROOM, stats=None):
+        self.requests = TokenBucket(rpm * headroom) if rpm else None
+        self.tokens = TokenBucket(tpm * headroom) if tpm else None
+        self.stats = stats
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def for_tier(cls, tier=None, rpm=None, tpm=None, **kwargs):
+        """등급 기본 한도에 rpm/tpm 지정값을 덮어써서 생성"""
+        tier_rpm, tier_tpm = TIER_LIMITS[tier] if tier else (None, None)
+        return cls(rpm=rpm or tier_rpm, tpm=tpm or tier_tpm, **kwargs)
+
+    @property
+    def enabled(self):
+        return self.requests is not None or self.tokens is not None
+
+    def headroom(self, est_tokens=0):
+        """est_tokens 요청 후 남는 한도의 비율 (가장 여유가 적은 버킷 기준, 한도가 없으면 1.0)"""
+        ratios = [1.0]
+        if self.requests is not None:
+            self.requests._refill()
+            ratios.append((self.requests.level - 1) / self.requests.capacity)
+        if self.tokens is not None:
+            self.tokens._refill()
+            ratios.append((self.tokens.level - est_tokens) / self.tokens.capacity)
+        return min(ratios)
+
+    def _wait_time(self, est_tokens):
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(est_tokens))
+        return wait
+
+    async def acquire(self, est_tokens):
+        """요청 1개와 예상 입력 토큰 est_tokens를 차감 (한도 초과 시 대기)"""
+        if not self.enabled:
+            return
+        waited = 0.0
+        # 먼저 온 요청부터 차례대로 차감
+        async with self._lock:
+            while (wait := self._wait_time(est_tokens)) > 0:
+                waited += wait
+                await asyncio.sleep(wait)
+            if self.requests is not None:
+                self.requests.take(1)
+            if self.tokens is not None:
+                self.tokens.take(est_tokens)
+
+        if self.stats is not None:
+            self.stats.observe("rate_limit.wait_s", waited)
+
+    def settle(self, est_tokens, actual_tokens):
+        """응답의 실제 토큰 수로 acquire 때 차감한 예상치를 정산"""
+        if self.tokens is None or not actual_tokens:
+            return
+        self.tokens.take(actual_tokens - est_tokens)
+        if self.stats is not None:
+            self.stats.observe("rate_limit.token_error", actual_tokens - est_tokens)
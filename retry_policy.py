@@ -0,0 +1,203 @@
+"""API 호출 실패를 종류별로 분류하고 종류마다 다른 재시도 예산을 적용하는 정책
+
+실패 종류:
+    throttled       429/RESOURCE_EXHAUSTED (서버가 알려준 대기 시간을 따름)
+    transient       연결 끊김, 시간 초과 등 일시적인 네트워크 오류
+    timeout         요청 제한 시간(request_timeout) 초과 (장애로 보지 않음)
+    server          5xx 서버 오류
+    invalid_output  JSON 파싱 실패 등 응답 내용 오류
+    permanent       400(잘못된 PDF, 너무 큰 요청) 등 다시 보내도 실패할 오류
+    circuit_open    circuit breaker가 열려 요청을 보내지 않음 (재시도하지 않고 대기열로)
+"""
+
+import asyncio
+import logging
+import random
+import re
+from collections import Counter
+
+from tenacity import AsyncRetrying, retry_if_exception_type
+
+from concurrency_limiter import is_throttle_error
+
+logger = logging.getLogger(__name__)
+
+THROTTLED = "throttled"
+TRANSIENT = "transient"
+TIMEOUT = "timeout"
+SERVER = "server"
+INVALID_OUTPUT = "invalid_output"
+PERMANENT = "permanent"
+CIRCUIT_OPEN = "circuit_open"
+
+# 실패 종류별 최대 재시도 횟수
+DEFAULT_BUDGETS = {
+    THROTTLED: 8,
+    TRANSIENT: 4,
+    TIMEOUT: 2,
+    SERVER: 4,
+    INVALID_OUTPUT: 2,
+    PERMANENT: 0,
+    CIRCUIT_OPEN: 0,
+}
+# 실패 종류별 첫 재시도 대기 시간(초). 이후 두 배씩 늘어나고 full jitter 적용
+DEFAULT_BASE_DELAYS = {
+    THROTTLED: 5.0,
+    TRANSIENT: 1.0,
+    TIMEOUT: 1.0,
+    SERVER: 2.0,
+    INVALID_OUTPUT: 0.5,
+    PERMANENT: 0.0,
+    CIRCUIT_OPEN: 0.0,
+}
+DEFAULT_MAX_DELAY = 60.0
+# 서버가 알려준 대기 시간에 더하는 최대 jitter 비율
+HINT_JITTER_RATIO = 0.2
+
+RETRY_IN_PATTERN = re.compile(r"retry in ([\d.]+)\s*s", re.IGNORECASE)
+DURATION_PATTERN = re.compile(r"^([\d.]+)s$")
+NETWORK_MODULES = ("httpx", "httpcore", "aiohttp")
+
+
+class RequestTimeoutError(TimeoutError):
+    """요청이 클라이언트 쪽 제한 시간 안에 끝나지 않았음을 나타내는 오류"""
+
+    failure_class = TIMEOUT
+
+
+def classify_error(error):
+    """예외를 실패 종류 문자열로 분류 (failure_class 속성이 있으면 그대로 사용)"""
+    failure_class = getattr(error, "failure_class", None)
+    if failure_class in DEFAULT_BUDGETS:
+        return failure_class
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        if code == 429:
+            return THROTTLED
+        if code == 408:
+            return TRANSIENT
+        if code >= 500:
+            return SERVER
+        if 400 <= code < 500:
+            return PERMANENT
+    if isinstance(error, ValueError):
+        # json.JSONDecodeError 포함
+        return INVALID_OUTPUT
+    if is_throttle_error(error):
+        return THROTTLED
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return TRANSIENT
+    if type(error).__module__.startswith(NETWORK_MODULES):
+        return TRANSIENT
+    # 알 수 없는 오류는 일시적인 오류로 보고 제한된 횟수만 재시도
+    return TRANSIENT
+
+
+def _detail_delay(details):
+    """google.rpc.RetryInfo의 retryDelay("12s")를 초 단위로 변환"""
+    if isinstance(details, dict):
+        details = details.get("error", details).get("details", [])
+    for detail in details or []:
+        if not isinstance(detail, dict):
+            continue
+        match = DURATION_PATTERN.match(str(detail.get("retryDelay", "")))
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def retry_hint(error):
+    """오류에 담긴 서버의 재시도 대기 시간(초) 힌트, 없으면 None"""
+    delay = _detail_delay(getattr(error, "details", None))
+    if delay is not None:
+        return delay
+
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    retry_after = headers.get("Retry-After") or headers.get("retry-after")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+
+    match = RETRY_IN_PATTERN.search(str(error))
+    if match:
+        return float(match.group(1))
+    return None
+
+
+class RetryPolicy:
+    """실패 종류별 예산과 대기 시간을 적용하는 tenacity 재시도 설정을 생성"""
+
+    def __init__(
+        self,
+        budgets=None,
+        base_delays=None,
+        max_delay=DEFAULT_MAX_DELAY,
+        stats=None,
+    ):
+        self.budgets = {**DEFAULT_BUDGETS, **(budgets or {})}
+        self.base_delays = {**DEFAULT_BASE_DELAYS, **(base_delays or {})}
+        self.max_delay = max_delay
+        self.stats = stats
+
+    def backoff(self, failure, attempt, hint=None):
+        """failure 종류의 attempt번째 재시도 전 대기 시간(초)"""
+        if hint is not None:
+            return hint * (1 + random.uniform(0, HINT_JITTER_RATIO))
+        ceiling = self.base_delays[failure] * 2 ** (attempt - 1)
+        return random.uniform(0, min(self.max_delay, ceiling))
+
+    def retrying(self, sleep=asyncio.sleep, counts=None):
+        """호출 하나에 사용할 AsyncRetrying을 생성
+
+        sleep은 재시도 대기에 사용할 코루틴 함수로, 대기 중 동시 처리 슬롯을
+        반납하는 함수를 넘길 수 있음. counts(Counter)를 넘기면 여러
+        AsyncRetrying이 실패 종류별 횟수를 이어서 셈 (장애 복구 대기 후 재전송).
+        """
+        counts = Counter() if counts is None else counts
+        counted = set()
+
+        def count(retry_state):
+            """시도 결과의 실패 종류를 한 번만 세고 (종류, 누적 횟수)를 반환
+
+            tenacity 8.3 이후로는 wait가 stop보다 먼저 호출되므로 먼저 불린 쪽에서 셈.
+            """
+            failure = classify_error(retry_state.outcome.exception())
+            if retry_state.attempt_number not in counted:
+                counted.add(retry_state.attempt_number)
+                counts[failure] += 1
+                if self.stats is not None:
+                    self.stats.incr(f"retry.failure.{failure}")
+            return failure, counts[failure]
+
+        def stop(retry_state):
+            failure, attempts = count(retry_state)
+            exhausted = attempts > self.budgets[failure]
+            if exhausted and self.stats is not None:
+                self.stats.incr(f"retry.gave_up.{failure}")
+            return exhausted
+
+        def wait(retry_state):
+            failure, attempts = count(retry_state)
+            if attempts > self.budgets[failure]:
+                # 예산을 다 써서 stop이 중단시킬 시도
+                return 0
+            error = retry_state.outcome.exception()
+            return self.backoff(failure, attempts, retry_hint(error))
+
+        def before_sleep(retry_state):
+            error = retry_state.outcome.exception()
+            logger.warning(
+                f"{retry_state.upcoming_sleep:.1f}초 후 재시도합니다 "
+                f"({classify_error(error)}): {error}"
+            )
+
+        return AsyncRetrying(
+            stop=stop,
+            wait=wait,
+            retry=retry_if_exception_type(Exception),
+            sleep=sleep,
+            before_sleep=before_sleep,
+            reraise=True,
+        )
@@ -0,0 +1,49 @@
+"""실행 중 수집하는 카운터와 관측값(지연 시간, 크기 등)"""
+
+import logging
+from collections import Counter, defaultdict
+
+logger = logging.getLogger(__name__)
+
+
+def _percentile(sorted_values, q):
+    """정렬된 값 목록에서 q(0~1) 분위수를 반환"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(q * len(sorted_values)))
+    return sorted_values[index]
+
+
+class RunStats:
+    """추출 실행 전체의 통계를 모으는 클래스"""
+
+    def __init__(self):
+        self.counters = Counter()
+        self.observations = defaultdict(list)
+
+    def incr(self, key, value=1):
+        """카운터를 증가"""
+        self.counters[key] += value
+
+    def observe(self, key, value):
+        """관측값(지연 시간, 바이트 수 등)을 기록"""
+        self.observations[key].append(value)
+
+    def summary(self):
+        """카운터와 관측값 요약(count/mean/p50/p95/max)을 dict로 반환"""
+        result = dict(sorted(self.counters.items()))
+        for key, values in sorted(self.observations.items()):
+            ordered = sorted(values)
+            result[key] = {
+                "count": len(ordered),
+                "mean": round(sum(ordered) / len(ordered), 3),
+                "p50": round(_percentile(ordered, 0.5), 3),
+                "p95": round(_percentile(ordered, 0.95), 3),
+                "max": round(ordered[-1], 3),
+            }
+        return result
+
+    def log_summary(self):
+        """요약을 로그로 출력"""
+        for key, value in self.summary().items():
+            logger.info(f"[stats] {key}: {value}")
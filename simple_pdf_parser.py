@@ -1,19 +1,48 @@
 import os
+import json
 import asyncio
+import tempfile
+import time
 import fitz
 import argparse
+import functools
 import logging
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from glob import glob
-from google import genai
-from google.genai import types
-from tenacity import (
-    retry,
-    stop_after_attempt,
-    wait_exponential,
-    retry_if_exception_type,
-)
 from dotenv import load_dotenv
 
+from backends import (
+    DEFAULT_MODEL,
+    ExtractionRequest,
+    ExtractionResponse,
+    GeminiBackend,
+)
+import chunk_planner
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from concurrency_limiter import AdaptiveConcurrencyLimiter, is_throttle_error
+from hedging import HedgePolicy
+from key_pool import KeyPool, key_label
+from model_router import DEFAULT_LIGHT_MODEL, ModelRouter
+import rate_limiter
+from retry_policy import (
+    INVALID_OUTPUT,
+    RequestTimeoutError,
+    RetryPolicy,
+    classify_error,
+    retry_hint,
+)
+from stream_json import ItemStreamParser, TruncatedStreamError
+import local_extractor
+import output_schema
+from output_schema import COMPACT_PROMPT_NOTE, OUTPUT_SCHEMAS
+import page_classifier
+import pdf_payload
+from executor_stage import ExecutorStage
+from run_stats import RunStats
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
@@ -31,6 +60,7 @@ PDF 문서를 페이지 순서, 그리고 페이지 내 위에서 아래 순서
 3. 제목은 "##"를 앞에 붙여서 마크다운 형식으로 표현합니다.
 4. 표(table)는 마크다운 테이블 형식으로 변환합니다.
 5. 각 페이지의 마지막 paragraph가 문법적으로 끝나지 않은 경우, is_incomplete 필드를 true로 설정합니다.
+6. "[TABLE 3-0]"과 같은 표시는 수정하지 않고 그대로 하나의 paragraph로 출력합니다.
 
 [JSON Output Schema]
 {
@@ -46,109 +76,899 @@ PDF 문서를 페이지 순서, 그리고 페이지 내 위에서 아래 순서
 """
 
 
+@dataclass
+class DocumentRoute:
+    """문서의 페이지를 로컬 처리와 API 전송으로 나눈 결과
+
+    local_result는 로컬에서 추출한 항목, redactions는 API로 보내기 전에 지울
+    영역({페이지 인덱스: [(bbox, 자리 표시 문자열), ...]})임.
+    """
+
+    local_result: dict
+    api_pages: list
+    features: dict = field(default_factory=dict)
+    redactions: dict = field(default_factory=dict)
+
+
 class SimplePDFExtractor:
     """PDF에서 텍스트만 추출하는 단순화된 클래스"""
 
     def __init__(
-        self, output_dir="output", api_key=None, chunk_size=3, concurrency_limit=5
+        self,
+        output_dir="output",
+        api_key=None,
+        api_keys=None,
+        key_cooldown=30.0,
+        chunk_size=3,
+        concurrency_limit=5,
+        max_concurrency=32,
+        circuit_failure_threshold=5,
+        circuit_reset_timeout=30.0,
+        circuit_max_probes=3,
+        tier=None,
+        rpm=None,
+        tpm=None,
+        lazy_split=True,
+        adaptive_chunking=False,
+        target_chunk_bytes=chunk_planner.DEFAULT_TARGET_CHUNK_BYTES,
+        max_chunk_input_tokens=chunk_planner.DEFAULT_MAX_CHUNK_INPUT_TOKENS,
+        max_chunk_output_tokens=chunk_planner.DEFAULT_MAX_CHUNK_OUTPUT_TOKENS,
+        max_chunk_pages=chunk_planner.DEFAULT_MAX_CHUNK_PAGES,
+        section_chunking=False,
+        slim_payload=True,
+        image_dpi=None,
+        jpeg_quality=pdf_payload.DEFAULT_JPEG_QUALITY,
+        split_workers=0,
+        cpu_workers=4,
+        hybrid=False,
+        payload_policy="pdf",
+        chunk_overlap=0,
+        backend=None,
+        backend_url=None,
+        model=DEFAULT_MODEL,
+        route_models=False,
+        light_model=DEFAULT_LIGHT_MODEL,
+        cache_prompt=False,
+        cache_ttl=3600,
+        streaming=False,
+        output_schema="full",
+        hedge_quantile=0.95,
+        hedge_max_ratio=0.05,
+        request_timeout=180.0,
+        document_timeout=None,
     ):
         self.output_dir = output_dir
-        self.api_key = api_key or os.environ.get("GEMINI_API_KEY")
+        # 여러 키를 지정하면 키마다 한도를 따로 두고 요청을 나눠 보냄.
+        # 우선순위: api_keys, api_key, GEMINI_API_KEYS, GEMINI_API_KEY
+        if api_keys is None:
+            if api_key:
+                api_keys = [api_key]
+            else:
+                api_keys = os.environ.get("GEMINI_API_KEYS", "").split(",")
+        self.api_keys = [key.strip() for key in api_keys if key.strip()]
+        if not self.api_keys and os.environ.get("GEMINI_API_KEY"):
+            self.api_keys = [os.environ["GEMINI_API_KEY"]]
+        self.api_key = self.api_keys[0] if self.api_keys else None
         self.chunk_size = chunk_size
         self.concurrency_limit = concurrency_limit
+        # True면 동시 처리 슬롯이 빌 때마다 청크를 하나씩 생성 (메모리 상한 유지)
+        self.lazy_split = lazy_split
+        # True면 chunk_size 대신 페이지 비용 추정치로 청크 경계를 정함
+        self.adaptive_chunking = adaptive_chunking
+        self.target_chunk_bytes = target_chunk_bytes
+        self.max_chunk_input_tokens = max_chunk_input_tokens
+        self.max_chunk_output_tokens = max_chunk_output_tokens
+        self.max_chunk_pages = max_chunk_pages
+        # True면 목차/제목으로 찾은 섹션 시작 페이지에서 청크를 자름 (적응형 청크에 적용)
+        self.section_chunking = section_chunking
+        # True면 청크마다 글꼴 서브셋, 미사용 객체 제거, 스트림 압축을 적용
+        self.slim_payload = slim_payload
+        # 지정하면 이 해상도(DPI)를 크게 넘는 이미지를 줄여서 JPEG로 다시 인코딩
+        self.image_dpi = image_dpi
+        self.jpeg_quality = jpeg_quality
+        # 1 이상이면 청크 생성을 여러 프로세스에서 병렬로 수행
+        self.split_workers = split_workers
+        # True면 텍스트 레이어가 온전한 페이지는 로컬에서 추출하고 나머지만 API로 보냄
+        self.hybrid = hybrid
+        # 청크 전송 형식 선택 정책 (pdf_payload.PAYLOAD_POLICIES 참고)
+        if payload_policy not in pdf_payload.PAYLOAD_POLICIES:
+            raise ValueError(f"알 수 없는 전송 형식 정책입니다: {payload_policy}")
+        self.payload_policy = payload_policy
+        # 청크 앞뒤로 문맥 확인용 페이지를 이만큼 덧붙임 (해당 페이지 결과는 버림)
+        self.chunk_overlap = chunk_overlap
+        self.model = model
+        # True면 텍스트 위주 청크는 light_model로 보내고, 응답 검증에 실패하면
+        # model로 올려서 재시도
+        self.route_models = route_models
+        # 응답을 스트리밍으로 받아 항목을 완성되는 대로 파싱
+        self.streaming = streaming
+        # 요청 하나의 제한 시간과 문서 하나의 전체 처리 시간 한도(초, None이면 무제한)
+        self.request_timeout = request_timeout
+        self.document_timeout = document_timeout
+        # 응답 형식 강제(full) 또는 짧은 키 스키마(compact) 사용 여부
+        if output_schema not in OUTPUT_SCHEMAS:
+            raise ValueError(f"알 수 없는 출력 스키마입니다: {output_schema}")
+        self.output_schema = output_schema
+        self.prompt = EXTRACT_TEXT_PROMPT
+        if output_schema == "compact":
+            self.prompt += COMPACT_PROMPT_NOTE
+        # 요청마다 함께 전송되는 프롬프트의 예상 토큰 수
+        self.prompt_tokens = int(len(self.prompt) / chunk_planner.CHARS_PER_TOKEN)
+        self._split_executor = None
 
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY is not provided or set in environment.")
+        # backend를 넘기지 않으면 키마다 Gemini 백엔드를 만듦.
+        # backend_url을 지정하면 해당 주소(예: fake_gemini_server)로 요청을 보냄.
+        if backend is None:
+            if not self.api_keys and backend_url:
+                self.api_key = "local"
+                self.api_keys = [self.api_key]
+            if not self.api_keys:
+                raise ValueError(
+                    "GEMINI_API_KEY is not provided or set in environment."
+                )
+            backends = [
+                (
+                    key_label(index, key),
+                    GeminiBackend(
+                        key,
+                        base_url=backend_url,
+                        cache_prompt=cache_prompt,
+                        cache_ttl=cache_ttl,
+                    ),
+                )
+                for index, key in enumerate(self.api_keys)
+            ]
+        else:
+            backends = [("0", backend)]
+        self.stats = RunStats()
+        # 동시 요청 수는 concurrency_limit에서 시작해 응답 상태에 따라
+        # max_concurrency까지 늘어나거나 줄어듦 (모든 문서가 공유)
+        self.limiter = AdaptiveConcurrencyLimiter(
+            initial_limit=min(self.concurrency_limit, max_concurrency),
+            max_limit=max_concurrency,
+            stats=self.stats,
+        )
+        # 만들어 둔 청크 수 (재시도 대기/장애 복구 대기로 슬롯을 반납한 청크 포함).
+        # 동시 처리 창 크기를 넘지 않게 하여 메모리 상한을 유지함.
+        self._live_chunks = 0
+        self._chunk_released = asyncio.Condition()
+        # 실패 종류별 예산으로 재시도 (대기 중에는 동시 처리 슬롯을 반납)
+        self.retry_policy = RetryPolicy(stats=self.stats)
+        # API 장애가 이어지면 요청을 멈추고 청크를 대기시켰다가 복구 후 재전송.
+        # 시험 요청이 연속 circuit_max_probes번 실패하면 대기 중인 청크를 포기함
+        self.breaker = CircuitBreaker(
+            failure_threshold=circuit_failure_threshold,
+            reset_timeout=circuit_reset_timeout,
+            max_failed_probes=circuit_max_probes,
+            stats=self.stats,
+        )
+        # 최근 지연 시간의 hedge_quantile 분위수보다 오래 걸리는 요청은 중복 전송
+        # (전체 요청의 hedge_max_ratio 비율까지)
+        self.hedger = HedgePolicy(
+            quantile=hedge_quantile, max_ratio=hedge_max_ratio, stats=self.stats
+        )
+        self.router = None
+        if route_models:
+            self.router = ModelRouter(light_model, model, stats=self.stats)
+        # 등급(tier) 또는 rpm/tpm을 지정하면 키마다 분당 요청/토큰 한도 아래로
+        # 속도 조절. 요청은 남은 한도가 가장 큰 키로 보내고, 할당량을 초과한 키는
+        # key_cooldown초(또는 서버가 알려준 시간) 동안 쉬게 함.
+        self.key_pool = KeyPool.from_backends(
+            backends,
+            tier=tier,
+            rpm=rpm,
+            tpm=tpm,
+            cooldown=key_cooldown,
+            stats=self.stats,
+        )
 
-        self.client = genai.Client(api_key=self.api_key)
-        self.semaphore = asyncio.Semaphore(self.concurrency_limit)
+        # 이벤트 루프는 네트워크 I/O만 담당하고 동기 작업은 전용 실행기에서 처리.
+        # MuPDF는 스레드 안전하지 않으므로 PyMuPDF 작업은 단일 스레드에서 실행함.
+        self.pdf_stage = ExecutorStage("pdf", 1, stats=self.stats)
+        # JSON 파싱, 텍스트 렌더링, 파일 저장
+        self.cpu_stage = ExecutorStage("cpu", cpu_workers, stats=self.stats)
 
         # 출력 디렉토리 생성
         os.makedirs(self.output_dir, exist_ok=True)
 
-    def _split_pdf(self, doc, chunk_size=None):
-        """PDF를 지정된 크기의 청크로 분할"""
+    def _chunk_options(self, start_page, end_page, route=None):
+        """pdf_payload.build_chunk에 넘길 옵션"""
+        # 문맥용으로 덧붙는 페이지까지 포함
+        start_page = max(0, start_page - self.chunk_overlap)
+        end_page = end_page + self.chunk_overlap
+        redactions = None
+        if route and route.redactions:
+            redactions = {
+                page_index: regions
+                for page_index, regions in route.redactions.items()
+                if start_page <= page_index < end_page
+            }
+        page_kinds = None
+        if route and route.features:
+            page_kinds = {
+                page_index: route.features[page_index].kind
+                for page_index in range(start_page, end_page)
+                if page_index in route.features
+            }
+        return {
+            "slim": self.slim_payload,
+            "image_dpi": self.image_dpi,
+            "jpeg_quality": self.jpeg_quality,
+            "redactions": redactions,
+            "payload_policy": self.payload_policy,
+            "page_kinds": page_kinds,
+            "context_pages": self.chunk_overlap,
+        }
+
+    def _build_chunk(self, doc, start_page, end_page, route=None):
+        """지정된 페이지 범위로 청크를 생성"""
+        options = self._chunk_options(start_page, end_page, route)
+        return pdf_payload.build_chunk(doc, start_page, end_page, **options)
+
+    def _record_chunk(self, chunk):
+        """청크의 원본/전송 용량을 통계에 기록"""
+        self.stats.incr("chunks")
+        self.stats.incr("chunk_original_bytes", chunk.original_size)
+        self.stats.incr("chunk_upload_bytes", chunk.size)
+        self.stats.incr("chunk_image_bytes_saved", chunk.image_bytes_saved)
+        self.stats.incr(f"payload_format.{chunk.payload_format}")
+        self.stats.incr(f"payload_bytes.{chunk.payload_format}", chunk.size)
+        self.stats.incr("payload_est_input_tokens", chunk.est_input_tokens)
+        logger.info(
+            f"청크 생성(페이지 {chunk.page_label}, {chunk.payload_format}): "
+            f"{chunk.original_size:,} → {chunk.size:,} 바이트"
+            f" (이미지 절감 {chunk.image_bytes_saved:,} 바이트)"
+        )
+
+    def _plan_chunk_ranges(self, doc, chunk_size=None, page_indices=None):
+        """청크로 묶을 페이지 범위 (start, end) 목록을 반환
+
+        page_indices가 주어지면 해당 페이지만 대상으로 하며, 연속되지 않은
+        페이지는 같은 청크로 묶지 않음.
+        """
+        if page_indices is None:
+            page_indices = range(doc.page_count)
+
+        if chunk_size is None and self.adaptive_chunking:
+            costs = chunk_planner.estimate_document_costs(doc, page_indices)
+            section_starts = None
+            if self.section_chunking:
+                section_starts = chunk_planner.find_section_starts(doc, page_indices)
+                logger.info(f"섹션 시작 페이지 {len(section_starts)}개를 찾았습니다.")
+            ranges = chunk_planner.plan_chunks(
+                costs,
+                target_bytes=self.target_chunk_bytes,
+                max_input_tokens=self.max_chunk_input_tokens,
+                max_output_tokens=self.max_chunk_output_tokens,
+                max_pages=self.max_chunk_pages,
+                section_starts=section_starts,
+            )
+            logger.info(
+                f"페이지 비용 기반으로 {len(costs)}페이지를 {len(ranges)}개 청크로 나눕니다."
+            )
+            return ranges
+
         if chunk_size is None:
             chunk_size = self.chunk_size
 
-        chunks = []
-        for i in range(0, doc.page_count, chunk_size):
-            start_page = i
-            end_page = min(i + chunk_size, doc.page_count)
-
-            chunk_doc = fitz.open()
-            chunk_doc.insert_pdf(doc, from_page=start_page, to_page=end_page - 1)
-
-            pdf_chunk_bytes = chunk_doc.tobytes()
-            chunks.append((pdf_chunk_bytes, start_page))
-            chunk_doc.close()
-
-        return chunks
-
-    @retry(
-        stop=stop_after_attempt(5),
-        wait=wait_exponential(multiplier=2, min=4, max=60),
-        retry=retry_if_exception_type((Exception,)),
-    )
-    async def _call_gemini_api(self, pdf_chunk_bytes):
-        """Gemini API를 호출하고 JSON 결과를 반환"""
-        prompt_parts = [
-            types.Part.from_text(text=EXTRACT_TEXT_PROMPT),
-            types.Part.from_bytes(data=pdf_chunk_bytes, mime_type="application/pdf"),
-        ]
-        contents = [types.Content(role="user", parts=prompt_parts)]
-        config = types.GenerateContentConfig(response_mime_type="application/json")
-
-        logger.info("청크를 Gemini API에 전송합니다...")
-        response = await self.client.aio.models.generate_content(
-            model="gemini-2.5-flash", contents=contents, config=config
+        ranges = []
+        start_page = prev_page = None
+        for page_index in page_indices:
+            if start_page is not None and (
+                page_index != prev_page + 1 or page_index - start_page >= chunk_size
+            ):
+                ranges.append((start_page, prev_page + 1))
+                start_page = None
+            if start_page is None:
+                start_page = page_index
+            prev_page = page_index
+        if start_page is not None:
+            ranges.append((start_page, prev_page + 1))
+        return ranges
+
+    def _route_pages(self, doc):
+        """페이지를 로컬 처리와 API 전송으로 나눈 DocumentRoute를 반환
+
+        hybrid 모드가 아니면 모든 페이지를 API로 보냄 (전송 형식 정책이 pdf가
+        아니면 분류 결과만 함께 반환). hybrid 모드에서는
+        텍스트 페이지와 깔끔한 표만 있는 페이지는 로컬에서 추출하고 빈 페이지는
+        건너뜀. API로 보내는 페이지의 깔끔한 표는 로컬에서 추출하고 청크에서 지움.
+        """
+        if not self.hybrid and self.payload_policy == "pdf" and not self.route_models:
+            return DocumentRoute({"data": []}, list(range(doc.page_count)))
+
+        features = {f.page_index: f for f in page_classifier.classify_document(doc)}
+        if not self.hybrid:
+            # 전송 형식과 모델 선택에만 분류 결과를 사용
+            for feature in features.values():
+                self.stats.incr(f"page_kind.{feature.kind}")
+            return DocumentRoute({"data": []}, list(range(doc.page_count)), features)
+
+        local_items = []
+        table_items = []
+        api_pages = []
+        redactions = {}
+        for page_index, feature in features.items():
+            self.stats.incr(f"page_kind.{feature.kind}")
+            if feature.kind == page_classifier.PAGE_BLANK:
+                continue
+
+            page = doc[page_index]
+            tables = []
+            if feature.table_count:
+                tables = local_extractor.extract_tables(page)
+                self.stats.incr("tables_local", len(tables))
+
+            fully_local = feature.locally_extractable or (
+                feature.kind == page_classifier.PAGE_TABLE
+                and len(tables) == feature.table_count
+            )
+            if fully_local:
+                local_items.extend(
+                    local_extractor.extract_page_items(page, tables=tables)
+                )
+                continue
+
+            api_pages.append(page_index)
+            for i, (bbox, markdown) in enumerate(tables):
+                marker = f"[TABLE {page_index}-{i}]"
+                redactions.setdefault(page_index, []).append((bbox, marker))
+                table_items.append(
+                    {
+                        "type": "table",
+                        "page_index": page_index,
+                        "content": markdown,
+                        "is_incomplete": False,
+                        "marker": marker,
+                    }
+                )
+
+        return DocumentRoute(
+            {"data": local_items, "tables": table_items},
+            api_pages,
+            features,
+            redactions,
+        )
+
+    def _iter_chunks(self, doc, chunk_size=None, route=None):
+        """PDF를 청크로 하나씩 생성 (요청 시점에만 바이트를 만듦)"""
+        page_indices = route.api_pages if route else None
+        for start_page, end_page in self._plan_chunk_ranges(
+            doc, chunk_size, page_indices
+        ):
+            yield self._build_chunk(doc, start_page, end_page, route)
+
+    def _split_pdf(self, doc, chunk_size=None, route=None):
+        """PDF를 지정된 크기의 청크로 분할"""
+        return list(self._iter_chunks(doc, chunk_size, route))
+
+    async def _aiter_chunks(self, doc, pdf_path, route=None):
+        """청크를 하나씩 내놓는 비동기 이터레이터 (청크 생성은 pdf 실행기에서 수행)"""
+        page_indices = route.api_pages if route else None
+        ranges = await self.pdf_stage.run(
+            self._plan_chunk_ranges, doc, None, page_indices
         )
-        logger.info("Gemini API 응답을 수신했습니다.")
 
+        if self.split_workers > 0 and len(ranges) > 1:
+            async for chunk in self._aiter_chunks_parallel(pdf_path, ranges, route):
+                yield chunk
+            return
+
+        for start_page, end_page in ranges:
+            chunk = await self.pdf_stage.run(
+                self._build_chunk, doc, start_page, end_page, route
+            )
+            self._record_chunk(chunk)
+            yield chunk
+
+    async def _aiter_chunks_parallel(self, pdf_path, ranges, route=None):
+        """프로세스 풀에서 청크를 병렬로 만들고 완성되는 순서대로 내놓음
+
+        각 워커는 원본 파일을 직접 열고, 청크 바이트는 임시 파일로 넘겨받음.
+        미리 만들어 두는 청크 수는 워커 수의 두 배로 제한함.
+        """
+        if self._split_executor is None:
+            # 실행기 스레드가 MuPDF 호출 중일 수 있으므로 fork 대신 forkserver 사용
+            self._split_executor = ProcessPoolExecutor(
+                max_workers=self.split_workers,
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+
+        loop = asyncio.get_running_loop()
+        lookahead = self.split_workers * 2
+        pending_ranges = iter(ranges)
+        pending = set()
+
+        with tempfile.TemporaryDirectory(prefix="pdf_chunks_") as tmp_dir:
+            try:
+                while True:
+                    for start_page, end_page in pending_ranges:
+                        pending.add(
+                            loop.run_in_executor(
+                                self._split_executor,
+                                functools.partial(
+                                    pdf_payload.build_chunk_file,
+                                    pdf_path,
+                                    start_page,
+                                    end_page,
+                                    tmp_dir,
+                                    **self._chunk_options(start_page, end_page, route),
+                                ),
+                            )
+                        )
+                        if len(pending) >= lookahead:
+                            break
+                    if not pending:
+                        break
+
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for future in done:
+                        chunk = await self.cpu_stage.run(
+                            pdf_payload.load_chunk_file, *future.result()
+                        )
+                        self._record_chunk(chunk)
+                        yield chunk
+            finally:
+                for future in pending:
+                    future.cancel()
+                if pending:
+                    await asyncio.wait(pending)
+
+    async def aclose(self):
+        """백엔드 연결과 실행기 등 실행 중 만든 자원을 정리"""
         try:
-            import json
+            await self.key_pool.aclose()
+        finally:
+            self.close()
+
+    def close(self):
+        """청크 생성용 프로세스 풀 등 실행 중 만든 자원을 정리"""
+        self.pdf_stage.shutdown()
+        self.cpu_stage.shutdown()
+        if self._split_executor is not None:
+            self._split_executor.shutdown(cancel_futures=True)
+            self._split_executor = None
+
+    def _extraction_request(self, payload_parts, model=None):
+        """청크 전송 내용으로 백엔드 요청을 만듦 (출력 스키마 설정 반영)"""
+        return ExtractionRequest(
+            prompt=self.prompt,
+            parts=payload_parts,
+            model=model or self.model,
+            response_schema=output_schema.response_schema(self.output_schema),
+        )
+
+    async def _call_gemini_api(self, payload_parts, est_input_tokens=0, model=None):
+        """추출 백엔드(기본값 Gemini API)를 한 번 호출하고 JSON 결과를 반환
+
+        payload_parts는 PDFChunk.payload_parts 형식의 (mime_type, 내용) 목록.
+        est_input_tokens는 프롬프트를 제외한 예상 입력 토큰 수로, RPM/TPM 한도
+        계산에 사용함. model을 지정하지 않으면 self.model을 사용함.
+        """
+        request = self._extraction_request(payload_parts, model)
+        est_tokens = self.prompt_tokens + est_input_tokens
+        # 시험 요청이 취소되면(문서 처리 시간 초과 등) 다른 요청이 시험하도록 넘김
+        probe = self.breaker.check()
+        try:
+            member = await self.key_pool.acquire(est_tokens)
+        except BaseException:
+            if probe:
+                self.breaker.abort_probe()
+            raise
+        started_at = time.monotonic()
+
+        async def send(hedged):
+            sent_by = member
+            if hedged:
+                # 중복 요청도 할당량을 쓰므로 (가능하면 다른 키의) 한도에 포함
+                sent_by = await self.key_pool.acquire(est_tokens, exclude=member)
+            logger.info(
+                f"청크를 Gemini API에 전송합니다... "
+                f"(키 {sent_by.label}, 동시 처리 창 {self.limiter.window})"
+            )
+            timeout = asyncio.timeout(self.request_timeout)
+            try:
+                async with timeout:
+                    if self.streaming:
+                        response, result_json = await self._stream_response(
+                            sent_by.backend, request, started_at
+                        )
+                    else:
+                        response = await sent_by.backend.generate(request)
+                        result_json = None
+            except TimeoutError as e:
+                if not timeout.expired():
+                    raise
+                # 서버 장애가 아니라 클라이언트 쪽 제한 시간 초과로 구분
+                raise RequestTimeoutError(
+                    f"요청이 {self.request_timeout:g}초 안에 끝나지 않았습니다."
+                ) from e
+            except Exception as e:
+                if is_throttle_error(e):
+                    self.key_pool.on_throttle(sent_by, retry_hint(e))
+                raise
+            finally:
+                self.key_pool.release(sent_by)
+            return sent_by, response, result_json
 
-            return json.loads(response.text)
+        try:
+            sent_by, response, result_json = await self.hedger.run(send)
+        except Exception as e:
+            if is_throttle_error(e):
+                self.limiter.on_throttle(started_at)
+            self.breaker.on_failure(classify_error(e))
+            raise
+        except BaseException:
+            if probe:
+                self.breaker.abort_probe()
+            raise
+        self.limiter.on_success(started_at)
+        self.breaker.on_success()
+        self.hedger.record(time.monotonic() - started_at)
+        self.stats.observe("request_latency_s", time.monotonic() - started_at)
+        self.key_pool.on_success(sent_by, est_tokens, response)
+        if self.router is not None:
+            self.router.record_request(
+                request.model, time.monotonic() - started_at, response
+            )
+        logger.info("Gemini API 응답을 수신했습니다.")
+        self.stats.incr("tokens_prompt", response.prompt_tokens)
+        self.stats.incr("tokens_prompt_cached", response.cached_tokens)
+        self.stats.incr(
+            "tokens_prompt_uncached", response.prompt_tokens - response.cached_tokens
+        )
+        self.stats.incr("tokens_output", response.output_tokens)
+
+        if result_json is not None:
+            return result_json
+        try:
+            result_json = await self.cpu_stage.run(json.loads, response.text)
+            return output_schema.expand_result(result_json)
         except json.JSONDecodeError as e:
             logger.error(f"JSON 파싱 실패: {e}")
             logger.error(f"응답 텍스트: {response.text[:500]}...")
             raise
 
-    async def _process_chunk(self, pdf_chunk_bytes, base_page_index):
-        """단일 PDF 청크를 처리하고 페이지 인덱스를 재조정"""
-        async with self.semaphore:
-            try:
-                result_json = await self._call_gemini_api(pdf_chunk_bytes)
+    async def _stream_response(self, backend, request, started_at):
+        """응답을 스트리밍으로 받으며 data[] 항목을 완성되는 대로 파싱
 
-                # 페이지 인덱스 재조정
-                if "data" in result_json:
-                    for item in result_json["data"]:
-                        if "page_index" in item:
-                            item["page_index"] += base_page_index
+        (토큰 사용량이 담긴 ExtractionResponse, 결과 JSON)을 반환. 응답이 중간에
+        잘리면 잘리기 전까지 완성된 항목을 담아 TruncatedStreamError를 발생시켜
+        재시도하게 함.
+        """
+        parser = ItemStreamParser(output_schema.data_key(self.output_schema))
+        items = []
+        usage = ExtractionResponse(text="")
+        async for delta in backend.stream(request):
+            if delta.prompt_tokens or delta.output_tokens:
+                usage = delta
+            new_items = await self.cpu_stage.run(parser.feed, delta.text)
+            if new_items and not items:
+                self.stats.observe("stream.first_item_s", time.monotonic() - started_at)
+            items.extend(output_schema.expand_item(item) for item in new_items)
 
-                return result_json
-            except Exception as e:
-                error_msg = str(e)
-                if "quota" in error_msg.lower() or "rate limit" in error_msg.lower():
-                    logger.warning(
-                        f"API 할당량 초과 (페이지 {base_page_index}): {error_msg}"
+        if not parser.complete:
+            self.stats.incr("stream_truncated")
+            raise TruncatedStreamError(
+                f"스트리밍 응답이 잘렸습니다 (완성된 항목 {len(items)}개).",
+                {"data": items},
+            )
+        return usage, {"data": items}
+
+    async def _process_chunk(self, chunk, deadline=None):
+        """단일 PDF 청크를 처리하고 페이지 인덱스를 재조정
+
+        deadline(loop.time() 기준)까지 슬롯을 얻지 못하거나 처리를 마치지 못하면
+        실패 결과를 반환함.
+        """
+        try:
+            async with asyncio.timeout_at(deadline):
+                await self.limiter.acquire()
+        except TimeoutError:
+            return self._failed_result(chunk, "deadline")
+        try:
+            return await self._process_chunk_in_slot(chunk, deadline)
+        finally:
+            self.limiter.release()
+
+    def _context_note(self, chunk):
+        """문맥 확인용 페이지를 출력하지 않도록 하는 안내 문구"""
+        indices = ", ".join(str(i) for i in chunk.context_indices)
+        return (
+            f"page_index {indices} 페이지는 앞뒤 문맥 확인용입니다. "
+            "이 페이지의 내용은 출력하지 말고, 다른 페이지의 문단 연결과 "
+            "is_incomplete 판단에만 참고하세요."
+        )
+
+    def _drop_context_items(self, chunk, result_json):
+        """재조정된 결과에서 문맥 확인용 페이지의 항목을 제거"""
+        kept = []
+        for item in result_json["data"]:
+            page_index = item.get("page_index", chunk.core_start)
+            if chunk.core_start <= page_index < chunk.core_end:
+                kept.append(item)
+        self.stats.incr("overlap_items_dropped", len(result_json["data"]) - len(kept))
+        result_json["data"] = kept
+
+    def _chunk_payload_parts(self, chunk):
+        """청크 전송 내용 (문맥 확인용 페이지가 있으면 안내 문구를 덧붙임)"""
+        payload_parts = chunk.payload_parts
+        if chunk.context_indices:
+            payload_parts = [*payload_parts, ("text/plain", self._context_note(chunk))]
+        return payload_parts
+
+    def _rebase_result(self, chunk, result_json):
+        """청크 기준 page_index를 문서 기준으로 바꾸고 문맥 확인용 항목을 제거"""
+        if "data" in result_json:
+            for item in result_json["data"]:
+                if "page_index" in item:
+                    item["page_index"] += chunk.start_page
+
+            if chunk.context_indices:
+                self._drop_context_items(chunk, result_json)
+        return result_json
+
+    def _failed_result(self, chunk, reason):
+        """처리하지 못한 청크의 결과 (누락 페이지 범위와 사유를 기록)"""
+        self.stats.incr(f"chunks_failed.{reason}")
+        return {
+            "data": [],
+            "failed": {
+                "start_page": chunk.core_start,
+                "end_page": chunk.core_end,
+                "reason": reason,
+            },
+        }
+
+    async def _process_chunk_in_slot(self, chunk, deadline=None):
+        """이미 확보한 동시 처리 슬롯 안에서 청크를 처리
+
+        성공하면 결과에 처리한 페이지 범위("pages")를 담고, 실패하면
+        _failed_result를 반환함. 재시도 후에도 스트리밍 응답이 잘리면
+        _partial_result로 잘리기 전 항목을 사용함.
+        """
+        timeout = asyncio.timeout_at(deadline)
+        try:
+            async with timeout:
+                result_json = await self._request_chunk(
+                    chunk, self._chunk_payload_parts(chunk)
+                )
+            result_json = self._rebase_result(chunk, result_json)
+            result_json["pages"] = [chunk.core_start, chunk.core_end]
+            return result_json
+        except Exception as e:
+            reason = "deadline" if timeout.expired() else classify_error(e)
+            logger.error(f"청크 처리 실패(페이지 {chunk.page_label}, {reason}): {e}")
+            if isinstance(e, TruncatedStreamError) and e.partial_result["data"]:
+                return self._partial_result(chunk, e.partial_result)
+            return self._failed_result(chunk, reason)
+
+    def _partial_result(self, chunk, result_json):
+        """잘린 응답의 결과 (마지막 항목의 페이지 이후는 누락 페이지로 기록)"""
+        result_json = self._rebase_result(chunk, result_json)
+        last_page = max(
+            (item.get("page_index", chunk.core_start) for item in result_json["data"]),
+            default=chunk.core_start - 1,
+        )
+        done_end = min(chunk.core_end, max(chunk.core_start, last_page + 1))
+        result_json["pages"] = [chunk.core_start, done_end]
+        if done_end < chunk.core_end:
+            self.stats.incr("chunks_failed.truncated")
+            result_json["failed"] = {
+                "start_page": done_end,
+                "end_page": chunk.core_end,
+                "reason": "truncated",
+            }
+        logger.warning(
+            f"잘린 응답의 항목 {len(result_json['data'])}개를 사용합니다 "
+            f"(페이지 {chunk.core_start}-{done_end - 1} 처리)."
+        )
+        return result_json
+
+    async def _request_chunk(self, chunk, payload_parts):
+        """재시도 정책에 따라 청크를 전송하고, circuit이 열리면 대기 후 재전송
+
+        실패 종류별 재시도 횟수는 복구 대기 전후로 이어서 세고, 시험 요청이
+        계속 실패해 breaker가 복구를 포기하면 CircuitOpenError를 그대로 전달함.
+        모델 라우팅을 사용하면 페이지 종류로 모델을 고르고, 응답 검증에
+        실패하면 다음 재시도부터 더 강한 모델로 보냄.
+        """
+        model = initial_model = self._choose_model(chunk)
+        page_count = chunk.end_page - chunk.start_page
+        counts = Counter()
+        try:
+            while True:
+                try:
+                    retrying = self.retry_policy.retrying(
+                        sleep=self._sleep_without_slot, counts=counts
                     )
-                    logger.info("잠시 대기 후 재시도합니다...")
-                    await asyncio.sleep(10)  # 10초 대기
-                logger.error(f"청크 처리 실패(시작 페이지 {base_page_index}): {e}")
-                return None
+                    async for attempt in retrying:
+                        with attempt:
+                            try:
+                                result_json = await self._call_gemini_api(
+                                    payload_parts, chunk.est_input_tokens, model
+                                )
+                                if self.router is not None:
+                                    output_schema.validate_result(
+                                        result_json, page_count
+                                    )
+                                return result_json
+                            except Exception as e:
+                                model = self._escalate_model(chunk, model, e)
+                                raise
+                except CircuitOpenError:
+                    if self.breaker.gave_up:
+                        raise
+                    # 청크를 버리지 않고 슬롯을 반납한 채 복구를 기다렸다가 다시 보냄
+                    logger.info(f"API 복구 대기 중: 페이지 {chunk.page_label}")
+                    self.stats.incr("circuit.parked")
+                    await self.limiter.while_released(self.breaker.wait_ready())
+        finally:
+            if self.router is not None:
+                self.router.record_chunk(initial_model, model != initial_model)
+
+    def _choose_model(self, chunk):
+        """청크를 처음 보낼 모델 (라우팅을 사용하지 않으면 self.model)"""
+        if self.router is None:
+            return self.model
+        return self.router.choose(chunk)
+
+    def _escalate_model(self, chunk, model, error):
+        """응답 검증 실패면 다음 재시도에 쓸 더 강한 모델을, 아니면 model을 반환"""
+        if self.router is None or classify_error(error) != INVALID_OUTPUT:
+            return model
+        stronger = self.router.escalate(model)
+        if stronger is None:
+            return model
+        logger.warning(
+            f"{model} 응답 검증 실패(페이지 {chunk.page_label}): {error}. "
+            f"{stronger}로 다시 보냅니다."
+        )
+        return stronger
+
+    async def _sleep_without_slot(self, delay):
+        """재시도 대기 중에는 동시 처리 슬롯을 반납했다가 다시 확보"""
+        await self.limiter.while_released(asyncio.sleep(delay))
+
+    async def _reserve_chunk(self):
+        """만들어 둔 청크 수가 동시 처리 창보다 작아질 때까지 대기한 뒤 자리를 확보"""
+        async with self._chunk_released:
+            await self._chunk_released.wait_for(
+                lambda: self._live_chunks < self.limiter.window
+            )
+            self._live_chunks += 1
+
+    async def _release_chunk(self):
+        """청크 처리가 끝났음을 알리고 다음 청크를 만들 수 있게 함"""
+        async with self._chunk_released:
+            self._live_chunks -= 1
+            self._chunk_released.notify_all()
+
+    async def _release_dispatch(self):
+        """_acquire_dispatch로 확보한 슬롯과 청크 자리를 반환"""
+        self.limiter.release()
+        await asyncio.shield(self._release_chunk())
+
+    async def _release_after(self, coro):
+        """코루틴 완료 후 동시 처리 슬롯과 청크 자리를 반환"""
+        try:
+            return await coro
+        finally:
+            await self._release_dispatch()
+
+    async def _acquire_dispatch(self):
+        """청크 자리와 동시 처리 슬롯을 차례로 확보"""
+        await self._reserve_chunk()
+        try:
+            await self.limiter.acquire()
+        except BaseException:
+            await asyncio.shield(self._release_chunk())
+            raise
+
+    async def _dispatch_chunks(self, chunks, deadline=None):
+        """동시 처리 슬롯이 비었을 때만 다음 청크를 만들어 전송
+
+        슬롯을 먼저 확보한 뒤 청크를 생성하므로 메모리에 올라가는 청크 수는
+        동시 처리 창(limiter.window) 크기를 넘지 않음. 재시도나 장애 복구를
+        기다리는 청크는 슬롯을 반납하지만 청크 자리는 계속 차지하므로, 그동안
+        새 청크를 더 만들지 않음. deadline이 지나면 남은 청크는 만들지 않음
+        (누락 페이지로 기록됨).
+        """
+        tasks = []
+        while True:
+            try:
+                async with asyncio.timeout_at(deadline):
+                    await self._acquire_dispatch()
+            except TimeoutError:
+                logger.warning(
+                    "문서 처리 시간이 초과되어 남은 청크를 전송하지 않습니다."
+                )
+                await chunks.aclose()
+                break
+            try:
+                chunk = await anext(chunks)
+            except StopAsyncIteration:
+                await self._release_dispatch()
+                break
+            except BaseException:
+                await self._release_dispatch()
+                raise
+
+            task = asyncio.create_task(
+                self._release_after(self._process_chunk_in_slot(chunk, deadline))
+            )
+            tasks.append(task)
+            del chunk
+
+        logger.info(f"총 {len(tasks)}개 청크를 전송했습니다. 응답을 기다립니다...")
+        return await asyncio.gather(*tasks)
 
     def _merge_results(self, results):
         """여러 청크의 결과(JSON)를 하나로 병합"""
         final_json = {"data": []}
+        local_tables = {}
         for res in results:
             if res and "data" in res:
                 final_json["data"].extend(res["data"])
+            if res and "tables" in res:
+                local_tables.update((t["marker"], t) for t in res["tables"])
+
+        if local_tables:
+            final_json["data"] = self._place_local_tables(
+                final_json["data"], local_tables
+            )
 
         # 최종적으로 페이지 인덱스 순으로 정렬
         final_json["data"].sort(key=lambda x: x.get("page_index", 0))
+        self._reconcile_incomplete(final_json["data"])
         return final_json
 
+    def _reconcile_incomplete(self, items):
+        """청크 경계의 is_incomplete 표시를 다음 항목과 맞춤
+
+        다음 항목이 없거나 같은 페이지/다음 페이지에 있지 않으면 해제함. 실패하거나
+        처리하지 않은 페이지, 항목이 없는 페이지를 건너뛰어 문단이 이어 붙지 않게 함.
+        """
+        for item, next_item in zip(items, [*items[1:], None]):
+            if not item.get("is_incomplete"):
+                continue
+            page_index = item.get("page_index", 0)
+            if next_item is None or next_item.get("page_index", 0) not in (
+                page_index,
+                page_index + 1,
+            ):
+                item["is_incomplete"] = False
+
+    def _place_local_tables(self, items, local_tables):
+        """모델 출력의 표 자리 표시를 로컬에서 추출한 표 항목으로 교체
+
+        자리 표시를 찾지 못한 표는 해당 페이지 마지막에 붙임.
+        """
+
+        def table_item(marker):
+            item = dict(local_tables.pop(marker))
+            item.pop("marker")
+            return item
+
+        placed = []
+        for item in items:
+            content = item.get("content", "")
+            markers = [marker for marker in local_tables if marker in content]
+            if not markers:
+                placed.append(item)
+                continue
+
+            for marker in markers:
+                content = content.replace(marker, "")
+            if content.strip():
+                placed.append({**item, "content": content.strip()})
+            placed.extend(table_item(marker) for marker in markers)
+
+        placed.extend(table_item(marker) for marker in list(local_tables))
+        return placed
+
     def _json_to_text(self, json_data):
         """JSON 데이터를 마크다운 형식의 텍스트로 변환"""
         if not json_data or "data" not in json_data or not json_data["data"]:
@@ -202,58 +1022,155 @@ class SimplePDFExtractor:
 
         logger.info(f"PDF 열기: {pdf_path}")
         try:
-            doc = fitz.open(pdf_path)
+            doc = await self.pdf_stage.run(fitz.open, pdf_path)
         except Exception as e:
             logger.error(f"PDF 열기 실패: {pdf_path} (사유: {e})")
             return
 
-        logger.info("PDF를 청크로 분할합니다...")
-        pdf_chunks = self._split_pdf(doc)
+        # 문서 전체 처리 시간 한도 (모든 청크에 같은 deadline을 전달)
+        deadline = None
+        if self.document_timeout:
+            deadline = asyncio.get_running_loop().time() + self.document_timeout
 
-        tasks = [
-            self._process_chunk(chunk_bytes, base_index)
-            for chunk_bytes, base_index in pdf_chunks
-        ]
+        route = await self.pdf_stage.run(self._route_pages, doc)
+        api_pages = route.api_pages
+        if self.hybrid:
+            local_pages = doc.page_count - len(api_pages)
+            self.stats.incr("pages_local", local_pages)
+            logger.info(
+                f"로컬 처리 {local_pages}페이지(빈 페이지 포함), "
+                f"API 전송 {len(api_pages)}페이지"
+            )
+        self.stats.incr("pages_api", len(api_pages))
 
-        logger.info(f"총 {len(tasks)}개 청크를 동시 처리합니다...")
-        results = await asyncio.gather(*tasks)
+        if not api_pages:
+            results = []
+        elif self.lazy_split:
+            logger.info("PDF를 청크 단위로 생성하며 순차 전송합니다...")
+            results = await self._dispatch_chunks(
+                self._aiter_chunks(doc, pdf_path, route), deadline
+            )
+        else:
+            logger.info("PDF를 청크로 분할합니다...")
+            pdf_chunks = await self.pdf_stage.run(self._split_pdf, doc, None, route)
+            for chunk in pdf_chunks:
+                self._record_chunk(chunk)
+
+            tasks = [self._process_chunk(chunk, deadline) for chunk in pdf_chunks]
+
+            logger.info(f"총 {len(tasks)}개 청크를 동시 처리합니다...")
+            results = await asyncio.gather(*tasks)
 
         logger.info("청크 결과를 병합합니다...")
-        final_json = self._merge_results(results)
+        final_json = await self.cpu_stage.run(
+            self._merge_results, [route.local_result, *results]
+        )
 
         # JSON을 텍스트로 변환
-        final_text = self._json_to_text(final_json)
+        final_text = await self.cpu_stage.run(self._json_to_text, final_json)
 
         # 텍스트 파일로 저장
         output_path = os.path.join(self.output_dir, f"{base_filename}.txt")
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(final_text)
+        await self.cpu_stage.run(self._write_text, output_path, final_text)
+
+        missing = self._missing_ranges(api_pages, results)
+        await self.cpu_stage.run(self._write_missing, output_path, pdf_path, missing)
 
         logger.info(f"텍스트 추출 완료: {output_path}")
 
-        doc.close()
+        await self.pdf_stage.run(doc.close)
 
+    def _missing_ranges(self, api_pages, results):
+        """API로 보냈지만 결과를 얻지 못한 페이지를 연속 범위와 사유로 묶음
 
-async def main(input_path, output_dir, api_key=None):
-    """메인 함수"""
-    extractor = SimplePDFExtractor(output_dir=output_dir, api_key=api_key)
+        실패한 청크는 실패 사유를, 시간 초과로 전송하지 못한 청크는 deadline을
+        사유로 기록함.
+        """
+        done = set()
+        reasons = {}
+        for res in results:
+            if not res:
+                continue
+            if "pages" in res:
+                done.update(range(*res["pages"]))
+            if "failed" in res:
+                failed = res["failed"]
+                for page_index in range(failed["start_page"], failed["end_page"]):
+                    reasons[page_index] = failed["reason"]
 
-    if os.path.isdir(input_path):
-        logger.info(f"디렉터리 내 모든 PDF 처리: {input_path}")
-        pdf_files = glob(os.path.join(input_path, "*.pdf"))
-        if not pdf_files:
-            logger.warning("디렉터리에서 PDF 파일을 찾지 못했습니다.")
+        ranges = []
+        for page_index in api_pages:
+            if page_index in done:
+                continue
+            reason = reasons.get(page_index, "deadline")
+            last = ranges[-1] if ranges else None
+            if last and last["end_page"] == page_index and last["reason"] == reason:
+                last["end_page"] = page_index + 1
+            else:
+                ranges.append(
+                    {
+                        "start_page": page_index,
+                        "end_page": page_index + 1,
+                        "reason": reason,
+                    }
+                )
+        return ranges
+
+    def _write_missing(self, output_path, pdf_path, missing):
+        """누락 페이지 범위를 출력 파일 옆 .missing.json에 기록 (없으면 삭제)"""
+        missing_path = os.path.splitext(output_path)[0] + ".missing.json"
+        if not missing:
+            if os.path.exists(missing_path):
+                os.remove(missing_path)
             return
 
-        # 동시 실행할 태스크 목록 생성
-        tasks = [extractor.extract_text(pdf_file) for pdf_file in pdf_files]
-        await asyncio.gather(*tasks)
+        pages = sum(r["end_page"] - r["start_page"] for r in missing)
+        self.stats.incr("pages_missing", pages)
+        logger.warning(
+            f"{pages}페이지를 추출하지 못해 부분 결과를 저장했습니다: {missing_path}"
+        )
+        with open(missing_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"pdf_path": pdf_path, "missing": missing},
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+
+    def _write_text(self, output_path, text):
+        """텍스트 파일로 저장"""
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(text)
 
-    elif os.path.isfile(input_path) and input_path.lower().endswith(".pdf"):
-        await extractor.extract_text(input_path)
 
-    else:
-        logger.error(f"유효하지 않은 경로입니다: '{input_path}'")
+async def main(input_path, output_dir, api_key=None, **extractor_options):
+    """메인 함수"""
+    extractor = SimplePDFExtractor(
+        output_dir=output_dir, api_key=api_key, **extractor_options
+    )
+
+    try:
+        if os.path.isdir(input_path):
+            logger.info(f"디렉터리 내 모든 PDF 처리: {input_path}")
+            pdf_files = glob(os.path.join(input_path, "*.pdf"))
+            if not pdf_files:
+                logger.warning("디렉터리에서 PDF 파일을 찾지 못했습니다.")
+                return
+
+            # 동시 실행할 태스크 목록 생성
+            tasks = [extractor.extract_text(pdf_file) for pdf_file in pdf_files]
+            await asyncio.gather(*tasks)
+
+        elif os.path.isfile(input_path) and input_path.lower().endswith(".pdf"):
+            await extractor.extract_text(input_path)
+
+        else:
+            logger.error(f"유효하지 않은 경로입니다: '{input_path}'")
+            return
+
+        extractor.stats.log_summary()
+    finally:
+        await extractor.aclose()
 
 
 if __name__ == "__main__":
@@ -274,17 +1191,271 @@ if __name__ == "__main__":
     parser.add_argument(
         "--api_key", help="Gemini API 키. 미지정 시 GEMINI_API_KEY 환경변수를 사용"
     )
+    parser.add_argument(
+        "--api_keys",
+        help="쉼표로 구분한 여러 API 키 (키마다 한도를 따로 두고 요청을 나눠 보냄). "
+        "미지정 시 GEMINI_API_KEYS 환경변수를 사용",
+    )
+    parser.add_argument(
+        "--key_cooldown",
+        type=float,
+        default=30.0,
+        help="할당량을 초과한 키를 쉬게 하는 기본 시간(초)",
+    )
+    parser.add_argument(
+        "--chunk_size",
+        type=int,
+        default=3,
+        help="청크 하나에 담을 페이지 수. 기본값은 3",
+    )
+    parser.add_argument(
+        "--adaptive_chunking",
+        action="store_true",
+        help="고정 페이지 수 대신 페이지별 용량/토큰 추정치로 청크를 나눔",
+    )
+    parser.add_argument(
+        "--target_chunk_bytes",
+        type=int,
+        default=chunk_planner.DEFAULT_TARGET_CHUNK_BYTES,
+        help="적응형 청크 하나의 예상 전송 용량 상한(바이트)",
+    )
+    parser.add_argument(
+        "--max_chunk_input_tokens",
+        type=int,
+        default=chunk_planner.DEFAULT_MAX_CHUNK_INPUT_TOKENS,
+        help="적응형 청크 하나의 예상 입력 토큰 상한",
+    )
+    parser.add_argument(
+        "--max_chunk_output_tokens",
+        type=int,
+        default=chunk_planner.DEFAULT_MAX_CHUNK_OUTPUT_TOKENS,
+        help="적응형 청크 하나의 예상 출력 토큰 상한",
+    )
+    parser.add_argument(
+        "--max_chunk_pages",
+        type=int,
+        default=chunk_planner.DEFAULT_MAX_CHUNK_PAGES,
+        help="적응형 청크 하나에 담을 최대 페이지 수",
+    )
+    parser.add_argument(
+        "--section_chunking",
+        action="store_true",
+        help="목차와 제목 글꼴로 찾은 섹션 시작 페이지에서 청크를 자름 (--adaptive_chunking 포함)",
+    )
+
+    parser.add_argument(
+        "--no_slim_payload",
+        action="store_true",
+        help="청크 PDF의 글꼴 서브셋/압축 등 용량 줄이기 단계를 건너뜀",
+    )
+
+    parser.add_argument(
+        "--image_dpi",
+        type=int,
+        help="지정하면 이 해상도(DPI)를 크게 넘는 이미지를 줄여서 전송 (예: 150)",
+    )
+    parser.add_argument(
+        "--jpeg_quality",
+        type=int,
+        default=pdf_payload.DEFAULT_JPEG_QUALITY,
+        help="--image_dpi로 다시 인코딩할 때의 JPEG 품질",
+    )
+
+    parser.add_argument(
+        "--split_workers",
+        type=int,
+        default=0,
+        help="청크 생성에 사용할 프로세스 수. 0이면 이벤트 루프 프로세스에서 생성",
+    )
+
+    parser.add_argument(
+        "--cpu_workers",
+        type=int,
+        default=4,
+        help="JSON 파싱/텍스트 변환/파일 저장에 사용할 스레드 수",
+    )
+
+    parser.add_argument(
+        "--hybrid",
+        action="store_true",
+        help="텍스트 레이어가 온전한 페이지는 로컬에서 추출하고 나머지만 Gemini로 보냄",
+    )
+
+    parser.add_argument(
+        "--payload_policy",
+        choices=pdf_payload.PAYLOAD_POLICIES,
+        default="pdf",
+        help="청크 전송 형식 선택 정책. balanced/aggressive는 PDF, 래스터 이미지, "
+        "추출 텍스트 중 예상 비용이 가장 낮은 형식을 고름",
+    )
+
+    parser.add_argument(
+        "--chunk_overlap",
+        type=int,
+        default=0,
+        help="청크 앞뒤로 덧붙일 문맥 확인용 페이지 수 (해당 페이지 결과는 중복 제거)",
+    )
+
+    parser.add_argument(
+        "--concurrency_limit",
+        type=int,
+        default=5,
+        help="처음 동시에 보낼 요청 수 (응답 상태에 따라 자동 조절)",
+    )
+    parser.add_argument(
+        "--max_concurrency",
+        type=int,
+        default=32,
+        help="동시 요청 수 상한 (--concurrency_limit과 같으면 고정)",
+    )
+    parser.add_argument(
+        "--circuit_failure_threshold",
+        type=int,
+        default=5,
+        help="연속으로 이만큼 서버/네트워크 오류가 나면 요청을 중단하고 복구를 기다림",
+    )
+    parser.add_argument(
+        "--circuit_reset_timeout",
+        type=float,
+        default=30.0,
+        help="요청 중단 후 시험 요청을 보내기까지 기다리는 시간(초)",
+    )
+    parser.add_argument(
+        "--circuit_max_probes",
+        type=int,
+        default=3,
+        help="시험 요청이 연속으로 이만큼 실패하면 복구 대기를 포기하고 누락 페이지로 기록",
+    )
+    parser.add_argument(
+        "--request_timeout",
+        type=float,
+        default=180.0,
+        help="요청 하나의 제한 시간(초). 초과하면 재시도",
+    )
+    parser.add_argument(
+        "--document_timeout",
+        type=float,
+        help="문서 하나의 전체 처리 시간 한도(초). 초과하면 부분 결과와 누락 페이지를 저장",
+    )
+    parser.add_argument(
+        "--hedge_quantile",
+        type=float,
+        default=0.95,
+        help="최근 지연 시간의 이 분위수보다 오래 걸리는 요청은 중복 전송",
+    )
+    parser.add_argument(
+        "--hedge_max_ratio",
+        type=float,
+        default=0.05,
+        help="중복 전송 요청의 최대 비율 (0이면 사용하지 않음)",
+    )
+    parser.add_argument(
+        "--tier",
+        choices=sorted(rate_limiter.TIER_LIMITS),
+        help="프로젝트 등급. 등급별 RPM/TPM 한도 바로 아래로 요청 속도를 조절",
+    )
+    parser.add_argument("--rpm", type=int, help="분당 요청 수 한도 (등급 기본값 대신)")
+    parser.add_argument(
+        "--tpm", type=int, help="분당 입력 토큰 수 한도 (등급 기본값 대신)"
+    )
+    parser.add_argument(
+        "--backend_url",
+        help="Gemini API 대신 요청을 보낼 주소 (예: fake_gemini_server의 http://127.0.0.1:8080)",
+    )
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="사용할 모델 이름")
+    parser.add_argument(
+        "--route_models",
+        action="store_true",
+        help="텍스트 위주 청크는 --light_model로 보내고, 표/스캔 페이지가 있거나 "
+        "응답 검증에 실패한 청크는 --model로 보냄",
+    )
+    parser.add_argument(
+        "--light_model",
+        default=DEFAULT_LIGHT_MODEL,
+        help="모델 라우팅에서 쉬운 청크에 쓸 모델 이름",
+    )
+    parser.add_argument(
+        "--output_schema",
+        default="full",
+        choices=OUTPUT_SCHEMAS,
+        help="응답 형식 강제 방식. full: response_schema 적용, "
+        "compact: 짧은 키 스키마로 출력 토큰 절감, none: JSON 형식만 지정",
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="응답을 스트리밍으로 받아 항목을 완성되는 대로 파싱 (잘린 응답도 일부 사용)",
+    )
+    parser.add_argument(
+        "--cache_prompt",
+        action="store_true",
+        help="추출 프롬프트를 Gemini cached content로 만들어 요청마다 재사용",
+    )
+    parser.add_argument(
+        "--cache_ttl", type=int, default=3600, help="프롬프트 캐시 TTL(초)"
+    )
 
     args = parser.parse_args()
 
-    # API 키 확인
-    api_key = args.api_key or os.environ.get("GEMINI_API_KEY")
-    if not api_key:
+    # API 키 확인 (로컬 대역 서버를 쓰는 경우 생략 가능)
+    # 키 우선순위는 SimplePDFExtractor에서 정함
+    api_keys = args.api_keys.split(",") if args.api_keys else None
+    has_key = (
+        args.api_key
+        or args.api_keys
+        or os.environ.get("GEMINI_API_KEYS")
+        or os.environ.get("GEMINI_API_KEY")
+    )
+    if not has_key and not args.backend_url:
         logger.error("Gemini API 키가 설정되지 않았습니다.")
         logger.error(
-            "--api_key 옵션을 제공하거나 GEMINI_API_KEY 환경변수를 설정하세요."
+            "--api_key/--api_keys 옵션을 제공하거나 "
+            "GEMINI_API_KEY/GEMINI_API_KEYS 환경변수를 설정하세요."
         )
         exit(1)
 
     # 메인 비동기 함수 실행
-    asyncio.run(main(args.input_path, args.output_dir, api_key))
+    asyncio.run(
+        main(
+            args.input_path,
+            args.output_dir,
+            args.api_key,
+            api_keys=api_keys,
+            key_cooldown=args.key_cooldown,
+            chunk_size=args.chunk_size,
+            adaptive_chunking=args.adaptive_chunking or args.section_chunking,
+            section_chunking=args.section_chunking,
+            slim_payload=not args.no_slim_payload,
+            image_dpi=args.image_dpi,
+            jpeg_quality=args.jpeg_quality,
+            split_workers=args.split_workers,
+            cpu_workers=args.cpu_workers,
+            hybrid=args.hybrid,
+            payload_policy=args.payload_policy,
+            chunk_overlap=args.chunk_overlap,
+            concurrency_limit=args.concurrency_limit,
+            max_concurrency=args.max_concurrency,
+            circuit_failure_threshold=args.circuit_failure_threshold,
+            circuit_reset_timeout=args.circuit_reset_timeout,
+            circuit_max_probes=args.circuit_max_probes,
+            request_timeout=args.request_timeout,
+            document_timeout=args.document_timeout,
+            hedge_quantile=args.hedge_quantile,
+            hedge_max_ratio=args.hedge_max_ratio,
+            tier=args.tier,
+            rpm=args.rpm,
+            tpm=args.tpm,
+            backend_url=args.backend_url,
+            model=args.model,
+            route_models=args.route_models,
+            light_model=args.light_model,
+            cache_prompt=args.cache_prompt,
+            streaming=args.streaming,
+            output_schema=args.output_schema,
+            cache_ttl=args.cache_ttl,
+            target_chunk_bytes=args.target_chunk_bytes,
+            max_chunk_input_tokens=args.max_chunk_input_tokens,
+            max_chunk_output_tokens=args.max_chunk_output_tokens,
+            max_chunk_pages=args.max_chunk_pages,
+        )
+    )
@@ -0,0 +1,97 @@
+"""스트리밍 응답에서 {"data": [...]}의 항목을 완성되는 대로 꺼내는 점진적 파서
+
+압축 스키마 응답({"d": [...]})은 data_key="d"로 생성하여 파싱함.
+
+응답 조각을 feed()로 넣으면 그 시점까지 닫힌 data[] 항목 목록을 반환함.
+응답이 중간에 잘려도 잘리기 전까지 완성된 항목은 모두 반환된 상태가 됨.
+"""
+
+import json
+import re
+
+
+class TruncatedStreamError(ValueError):
+    """스트리밍 응답이 data 배열이 닫히기 전에 끝났음을 나타내는 오류
+
+    partial_result에 잘리기 전까지 완성된 항목({"data": [...]})을 담음.
+    ValueError이므로 응답 내용 오류(invalid_output)로 재시도됨.
+    """
+
+    def __init__(self, message, partial_result):
+        super().__init__(message)
+        self.partial_result = partial_result
+
+
+class ItemStreamParser:
+    """data 배열의 객체 항목을 하나씩 파싱하는 상태 기계"""
+
+    def __init__(self, data_key="data"):
+        self._data_array = re.compile(rf'"{re.escape(data_key)}"\s*:\s*\[')
+        self._buffer = ""
+        # 아직 검사하지 않은 버퍼 위치
+        self._pos = 0
+        self._in_array = False
+        self._finished = False
+        # 현재 읽고 있는 항목의 시작 위치와 중첩 깊이, 문자열 상태
+        self._item_start = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.item_count = 0
+
+    @property
+    def complete(self):
+        """data 배열이 닫혔는지 (응답이 잘리지 않았는지)"""
+        return self._finished
+
+    def feed(self, text):
+        """응답 조각을 추가하고 새로 완성된 항목 목록을 반환"""
+        if self._finished or not text:
+            return []
+        self._buffer += text
+
+        if not self._in_array:
+            match = self._data_array.search(self._buffer)
+            if not match:
+                return []
+            self._in_array = True
+            self._pos = match.end()
+
+        items = []
+        buffer = self._buffer
+        i = self._pos
+        while i < len(buffer):
+            ch = buffer[i]
+            if self._item_start is None:
+                if ch == "{":
+                    self._item_start = i
+                    self._depth = 1
+                elif ch == "]":
+                    self._finished = True
+                    break
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    items.append(json.loads(buffer[self._item_start : i + 1]))
+                    self._item_start = None
+            i += 1
+
+        # 파싱을 마친 부분은 버려 버퍼가 응답 전체만큼 커지지 않게 함
+        keep_from = self._item_start if self._item_start is not None else i
+        self._buffer = buffer[keep_from:]
+        if self._item_start is not None:
+            self._item_start = 0
+        self._pos = i - keep_from
+        self.item_count += len(items)
+        return items
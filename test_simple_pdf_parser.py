@@ -0,0 +1,187 @@
+"""fake_gemini_server를 상대로 SimplePDFExtractor 전체 흐름을 확인하는 테스트
+
+대역 서버를 같은 프로세스의 스레드로 띄우고 실제 GeminiBackend로 요청을 보냄.
+실행: uv run --with pytest pytest
+"""
+
+import asyncio
+import json
+import os
+import re
+import socket
+import threading
+
+import fitz
+import pytest
+
+from fake_gemini_server import FakeGeminiConfig, make_server, parse_latency
+from retry_policy import DEFAULT_BASE_DELAYS, RetryPolicy
+from simple_pdf_parser import SimplePDFExtractor
+
+PAGE_COUNT = 8
+# 재시도 대기를 줄여 테스트 시간을 짧게 유지
+FAST_DELAYS = {failure: 0.01 for failure in DEFAULT_BASE_DELAYS}
+PAGE_MARKER = re.compile(r"^\[page_index: (\d+)\]$")
+HEADING = re.compile(r"^## Heading (\d+)$")
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    doc = fitz.open()
+    for i in range(PAGE_COUNT):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Heading {i}")
+        page.insert_text((72, 100), f"Body of page {i}.")
+    path = str(tmp_path / "doc.pdf")
+    doc.save(path)
+    doc.close()
+    return path
+
+
+@pytest.fixture
+def fake_server():
+    """FakeGeminiConfig 설정으로 대역 서버를 띄우고 (주소, FakeGemini)를 반환하는 함수"""
+    servers = []
+
+    def start(**config):
+        server = make_server("127.0.0.1", 0, FakeGeminiConfig(**config))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        host, port = server.server_address
+        return f"http://{host}:{port}", server.fake
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def unused_url():
+    """연결을 받지 않는 로컬 주소"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+
+def extract(pdf_path, output_dir, backend_url, timeout=60, **options):
+    """추출을 실행하고 (페이지별 제목 목록, 누락 기록, 실행 통계)를 반환
+
+    timeout 안에 끝나지 않으면 실패함 (장애 상황에서도 실행이 끝나야 함).
+    """
+
+    async def run():
+        extractor = SimplePDFExtractor(
+            output_dir=output_dir,
+            backend_url=backend_url,
+            hedge_max_ratio=0,
+            **options,
+        )
+        extractor.retry_policy = RetryPolicy(
+            base_delays=FAST_DELAYS, stats=extractor.stats
+        )
+        try:
+            await asyncio.wait_for(extractor.extract_text(pdf_path), timeout)
+        finally:
+            await extractor.aclose()
+        return extractor.stats.counters
+
+    counters = asyncio.run(run())
+
+    headings = {}
+    page_index = None
+    with open(os.path.join(output_dir, "doc.txt"), encoding="utf-8") as f:
+        for line in f.read().splitlines():
+            if match := PAGE_MARKER.match(line):
+                page_index = int(match.group(1))
+            elif match := HEADING.match(line):
+                headings.setdefault(page_index, []).append(int(match.group(1)))
+
+    missing = []
+    missing_path = os.path.join(output_dir, "doc.missing.json")
+    if os.path.exists(missing_path):
+        with open(missing_path, encoding="utf-8") as f:
+            missing = json.load(f)["missing"]
+    return headings, missing, counters
+
+
+def missing_pages(missing):
+    return {
+        page_index: entry["reason"]
+        for entry in missing
+        for page_index in range(entry["start_page"], entry["end_page"])
+    }
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {},
+        {"streaming": True, "chunk_overlap": 1},
+        {"output_schema": "compact", "chunk_size": 2, "lazy_split": False},
+        {"adaptive_chunking": True, "max_chunk_pages": 3},
+    ],
+)
+def test_clean_run_maps_every_page_once(pdf_path, tmp_path, fake_server, options):
+    url, fake = fake_server()
+
+    headings, missing, counters = extract(
+        pdf_path, str(tmp_path / "out"), url, **options
+    )
+
+    # 청크 기준 page_index가 문서 기준으로 바뀌고, 문맥용 페이지 항목은 한 번만 남음
+    assert headings == {i: [i] for i in range(PAGE_COUNT)}
+    assert missing == []
+    assert fake.counters["ok"] == fake.counters["requests"]
+    assert not any(key.startswith("retry.") for key in counters)
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_injected_failures_are_retried(pdf_path, tmp_path, fake_server, streaming):
+    # seed 4에서는 처음 세 요청이 500, 잘린 응답, 429 순서로 실패함
+    url, fake = fake_server(
+        rate_429=0.15, rate_500=0.15, rate_truncated=0.15, retry_delay=0.01, seed=4
+    )
+
+    headings, missing, counters = extract(
+        pdf_path, str(tmp_path / "out"), url, chunk_size=2, streaming=streaming
+    )
+
+    assert fake.counters["status_429"] and fake.counters["status_500"]
+    assert fake.counters["truncated"]
+    assert counters["retry.failure.throttled"] and counters["retry.failure.server"]
+    assert counters["retry.failure.invalid_output"]
+    # 추출한 페이지와 누락으로 기록한 페이지가 겹치지 않고 문서 전체를 덮음
+    lost = missing_pages(missing)
+    assert set(headings) | set(lost) == set(range(PAGE_COUNT))
+    assert not set(headings) & set(lost)
+    assert all(headings[i] == [i] for i in headings)
+
+
+def test_unreachable_backend_gives_up_and_records_missing(pdf_path, tmp_path):
+    headings, missing, counters = extract(
+        pdf_path,
+        str(tmp_path / "out"),
+        unused_url(),
+        circuit_failure_threshold=2,
+        circuit_reset_timeout=0.05,
+        circuit_max_probes=2,
+    )
+
+    assert headings == {}
+    lost = missing_pages(missing)
+    assert set(lost) == set(range(PAGE_COUNT))
+    assert set(lost.values()) <= {"circuit_open", "transient"}
+    assert counters["circuit.gave_up"] == 1
+
+
+def test_request_timeout_does_not_open_circuit(pdf_path, tmp_path, fake_server):
+    url, _fake = fake_server(latency=parse_latency("fixed:1"))
+
+    headings, missing, counters = extract(
+        pdf_path, str(tmp_path / "out"), url, request_timeout=0.2
+    )
+
+    assert headings == {}
+    assert set(missing_pages(missing).values()) == {"timeout"}
+    assert counters["circuit.open"] == 0